@@ -1,282 +1,421 @@
 from datetime import date, timedelta
 
+import pandas as pd
 import streamlit as st
 
-from src import data_utils
+from src import data_utils, instrumentation
+from src.config import CONFIG
 from src.app_utils import st_horizontal
-from src.data_utils import get_workouts_by_routine_dfs, get_workouts_by_exercise_df, exercise_name_df, style_df, \
-    change_in_one_rep_max, get_workout_uuids_in_time_range, change_in_heaviest_weight, \
-    get_weekly_sets_last_three_months, get_routines_df, create_or_update_periodiq_plan, get_periodiq_plans_df, \
-    delete_periodiq_plan_by_id, get_workout_dfs_for_periodiq_plan
-from src.hevy.updater import refresh_data
-
-
-st.set_page_config("Periodiq")
-st.set_page_config(layout="wide")
-st.logo('images/periodiq-logo.png', size='large')
-
-dashboard_view, planner_view, workout_view, exercise_view, settings_view = st.tabs(
-    ["Dashboard", "Planner", "Workouts", "Exercises", "Settings"]
-)
-
-priority_exercises = [
-    "Squat (Barbell)",
-    "Deadlift (Barbell)",
-    "Deadlift (Trap bar)",
-    "Bench Press (Barbell)",
+from src.db.migrations import check_schema, SchemaVersionError
+from src.data_utils import get_workouts_by_routine_dfs, get_workouts_by_exercise_df, get_exercise_names_df, style_df, \
+    get_dashboard_metrics, get_weekly_sets_last_three_months, get_routines_df, create_or_update_periodiq_plan, \
+    get_periodiq_plans_df, delete_periodiq_plan_by_id, get_workout_dfs_for_periodiq_plan, get_e1rm_history, \
+    get_rep_max_table, get_weekly_muscle_group_volume, resolve_template_ids
+from src.hevy.worker import SyncWorker
+
+
+@st.cache_resource
+def get_sync_worker() -> SyncWorker:
+    # one background sync thread per server process, shared by all sessions
+    return SyncWorker().start()
+
+
+# Exercises of the Dashboard by exercise template id, which stays the same
+# when a title changes. Exercises without a fixed template id are looked up
+# by title (see resolve_template_ids). PERIODIQ_PRIORITY_EXERCISES in .env
+# (template ids, comma separated) replaces the list.
+PRIORITY_EXERCISES = [
+    ("D04AC939", "Squat (Barbell)"),
+    ("C6272009", "Deadlift (Barbell)"),
+    (None, "Deadlift (Trap bar)"),
+    ("79D0BB3A", "Bench Press (Barbell)"),
 ]
 
-with dashboard_view:
-    st.write("#### One Rep Max")
-    one_rm_cols = st.columns(len(priority_exercises))
-    for i, col in enumerate(one_rm_cols):
-        exercise = priority_exercises[i]
-        one_rm, one_rm_change = change_in_one_rep_max(exercise)
-        col.metric(
-            f"{exercise}",
-            one_rm,
-            delta=one_rm_change,
-            help=f"Best {exercise} 1RM in last 3 months and change to prior 3 months",
-            label_visibility="visible",
-            border=True,
-            width="stretch"
-        )
 
-    st.write("#### Heaviest Weight")
-    heaviest_weight_cols = st.columns(len(priority_exercises))
-    for i, col in enumerate(heaviest_weight_cols):
-        exercise = priority_exercises[i]
-        heaviest_weight, heaviest_weight_change = change_in_heaviest_weight(exercise)
-        col.metric(
-            f"{exercise}",
-            heaviest_weight,
-            delta=heaviest_weight_change,
-            help=f"Heaviest weight {exercise} in last 3 months and change to prior 3 months",
-            label_visibility="visible",
-            border=True,
-            width="stretch"
-        )
+render = instrumentation.start_render()
+
+# st.stop() and st.rerun() end a run by raising, the render is recorded anyway
+try:
+    st.set_page_config("Periodiq")
+    st.set_page_config(layout="wide")
+    st.logo('images/periodiq-logo.png', size='large')
+
+    try:
+        check_schema()
+    except SchemaVersionError as e:
+        st.error(str(e))
+        st.stop()
 
-    st.write("#### Sets per Week")
-    st.bar_chart(
-        get_weekly_sets_last_three_months(),
-        x="week_start",
-        y="set_count",
-        x_label="Week",
-        y_label="# Sets",
-        color=(255, 75, 75, 0.6)
+    dashboard_view, planner_view, workout_view, exercise_view, settings_view = st.tabs(
+        ["Dashboard", "Planner", "Workouts", "Exercises", "Settings"]
     )
 
-with planner_view:
-    # CREATE NEW PLAN (Modal)
-    # 1. Name of the plan
-    # 2. Description / Goals
-    # 3. Select Hevy Routines to include in this plan
-    # 4. Start Date / End Date
-    #
-    # SELECT / VIEW PLAN
-    # 1. Select plan from list
-    # -> Shows title and description
-    # -> Pulls in all workouts within the time frame of the plan
-    # -> All workouts whose name corresponds to plan routines, are grouped together
-    # -> All other workouts are grouped as UNCATEGORIZED
-    #
-    # EDIT PLAN (Modal)
-    # 1. Update (name, description, routines, start/end date
-    # 2. Delete plan
-    #
-    # CALENDAR VIEW
-    # 1. Shows plans in order (layout tbd)
-    # 2. Click on plan should select plan (maybe)
-
-    @st.dialog("Periodiq Plan", width='large')
-    def create_plan_modal(
-        plan_id=None,
-        name=None,
-        focus=None,
-        start_date=None,
-        end_date=None,
-        routine_uuids=None
-    ):
-
-        plan_name = st.text_input("Name", value=name)
-        plan_focus = st.text_input("Focus", value=focus)
-        start_date = st.date_input("Start Date", value=start_date)
-        end_date = st.date_input("End Date", value=end_date)
-
-        st.write("Routines:")
-        routines_df = get_routines_df()
-
-        pre_selected_rows = []
-        print(routine_uuids)
-        if routine_uuids:
-            filtered_uuids = routines_df.uuid.isin(routine_uuids)
-            pre_selected_rows = list(filtered_uuids[filtered_uuids].index)
-
-        selected_indices = st.multiselect(
-            "Select rows",
-            options=routines_df.index.tolist(),
-            default=pre_selected_rows,
-            format_func=lambda i: f"{routines_df.loc[i, 'title']} (uuid={routines_df.loc[i, 'uuid']})"
+    # one date per run, cached Dashboard results are keyed on it
+    today = date.today()
+
+    priority_exercises = [
+        t.strip() for t in (CONFIG.get("PERIODIQ_PRIORITY_EXERCISES") or "").split(",") if t.strip()
+    ] or resolve_template_ids(PRIORITY_EXERCISES)
+
+    with dashboard_view:
+        # indexed by exercise label, the current title (see get_exercises)
+        dashboard_metrics = get_dashboard_metrics(priority_exercises, today)
+
+        st.write("#### One Rep Max")
+        one_rm_cols = st.columns(len(dashboard_metrics))
+        for col, exercise in zip(one_rm_cols, dashboard_metrics.index):
+            col.metric(
+                f"{exercise}",
+                dashboard_metrics.at[exercise, "one_rep_max"],
+                delta=dashboard_metrics.at[exercise, "one_rep_max_change"],
+                help=f"Best {exercise} 1RM in last 3 months and change to prior 3 months",
+                label_visibility="visible",
+                border=True,
+                width="stretch"
+            )
+
+        st.write("#### Heaviest Weight")
+        heaviest_weight_cols = st.columns(len(dashboard_metrics))
+        for col, exercise in zip(heaviest_weight_cols, dashboard_metrics.index):
+            col.metric(
+                f"{exercise}",
+                dashboard_metrics.at[exercise, "heaviest_weight"],
+                delta=dashboard_metrics.at[exercise, "heaviest_weight_change"],
+                help=f"Heaviest weight {exercise} in last 3 months and change to prior 3 months",
+                label_visibility="visible",
+                border=True,
+                width="stretch"
+            )
+
+        st.write("#### Sets per Week")
+        st.bar_chart(
+            get_weekly_sets_last_three_months(today),
+            x="week_start",
+            y="set_count",
+            x_label="Week",
+            y_label="# Sets",
+            color=(255, 75, 75, 0.6)
         )
 
-        def _selected_routine_uuids():
-            return list(routines_df.iloc[selected_indices].uuid.unique())
+        st.write("#### Sets per Muscle Group")
+        st.bar_chart(
+            get_weekly_muscle_group_volume(today - timedelta(90), today + timedelta(days=1)),
+            x="week_start",
+            y="sets",
+            color="muscle_group",
+            x_label="Week",
+            y_label="# Sets (secondary muscles count half)"
+        )
 
-        with st_horizontal():
-            if st.button("Submit"):
-                create_or_update_periodiq_plan(
-                    periodiq_plan_id=plan_id,
-                    name=plan_name,
-                    description=plan_focus,
-                    start_date=start_date,
-                    end_date=end_date,
-                    routine_uuids=_selected_routine_uuids()
-                )
-                st.rerun()
-            if st.button("Delete"):
-                delete_periodiq_plan_by_id(periodiq_plan_id=plan_id)
-                st.rerun()
+        st.write("#### Estimated 1RM")
+        formula = st.radio("Formula", ["epley", "brzycki", "lombardi"], horizontal=True, format_func=str.title)
+        st.line_chart(
+            get_e1rm_history(priority_exercises, formula),
+            x="start_time",
+            y="best_e1rm",
+            color="exercise",
+            x_label="Date",
+            y_label="Best e1RM (lbs)"
+        )
 
+        st.write("#### Rep Maxes")
+        implied = st.toggle("Fill in weights implied by sets with more reps")
+        st.dataframe(get_rep_max_table(priority_exercises, implied))
+
+    with planner_view:
+        # CREATE NEW PLAN (Modal)
+        # 1. Name of the plan
+        # 2. Description / Goals
+        # 3. Select Hevy Routines to include in this plan
+        # 4. Start Date / End Date
+        #
+        # SELECT / VIEW PLAN
+        # 1. Select plan from list
+        # -> Shows title and description
+        # -> Pulls in all workouts within the time frame of the plan
+        # -> All workouts whose name corresponds to plan routines, are grouped together
+        # -> All other workouts are grouped as UNCATEGORIZED
+        #
+        # EDIT PLAN (Modal)
+        # 1. Update (name, description, routines, start/end date
+        # 2. Delete plan
+        #
+        # CALENDAR VIEW
+        # 1. Shows plans in order (layout tbd)
+        # 2. Click on plan should select plan (maybe)
+
+        @st.dialog("Periodiq Plan", width='large')
+        def create_plan_modal(
+            plan_id=None,
+            name=None,
+            focus=None,
+            start_date=None,
+            end_date=None,
+            routine_uuids=None
+        ):
+
+            plan_name = st.text_input("Name", value=name)
+            plan_focus = st.text_input("Focus", value=focus)
+            start_date = st.date_input("Start Date", value=start_date)
+            end_date = st.date_input("End Date", value=end_date)
+
+            st.write("Routines:")
+            routines_df = get_routines_df()
+
+            pre_selected_rows = []
+            print(routine_uuids)
+            if routine_uuids:
+                filtered_uuids = routines_df.uuid.isin(routine_uuids)
+                pre_selected_rows = list(filtered_uuids[filtered_uuids].index)
+
+            selected_indices = st.multiselect(
+                "Select rows",
+                options=routines_df.index.tolist(),
+                default=pre_selected_rows,
+                format_func=lambda i: f"{routines_df.loc[i, 'title']} (uuid={routines_df.loc[i, 'uuid']})"
+            )
 
-    with st_horizontal():
-        if st.button("Create Plan"):
-            create_plan_modal()
+            def _selected_routine_uuids():
+                return list(routines_df.iloc[selected_indices].uuid.unique())
+
+            with st_horizontal():
+                if st.button("Submit"):
+                    create_or_update_periodiq_plan(
+                        periodiq_plan_id=plan_id,
+                        name=plan_name,
+                        description=plan_focus,
+                        start_date=start_date,
+                        end_date=end_date,
+                        routine_uuids=_selected_routine_uuids()
+                    )
+                    st.rerun()
+                if st.button("Delete"):
+                    delete_periodiq_plan_by_id(periodiq_plan_id=plan_id)
+                    st.rerun()
 
-        button_slot = st.empty()
 
-    available_periodiq_plans = get_periodiq_plans_df()
-    periodiq_plan_df_selector = st.dataframe(
-        available_periodiq_plans,
-        hide_index=True,
-        on_select="rerun",
-        selection_mode="single-row",
-    )
+        with st_horizontal():
+            if st.button("Create Plan"):
+                create_plan_modal()
+
+            button_slot = st.empty()
 
-    if len(periodiq_plan_df_selector.selection.rows) == 0:
-        button_slot.empty()
+        available_periodiq_plans = get_periodiq_plans_df()
+        periodiq_plan_df_selector = st.dataframe(
+            available_periodiq_plans,
+            hide_index=True,
+            on_select="rerun",
+            selection_mode="single-row",
+        )
+
+        if len(periodiq_plan_df_selector.selection.rows) == 0:
+            button_slot.empty()
+
+        else:
+            if button_slot.button("Edit"):
+                idx = periodiq_plan_df_selector.selection.rows
+                selected_row = available_periodiq_plans.iloc[idx]
+                create_plan_modal(
+                    plan_id=int(selected_row.id.values[0]),
+                    name=selected_row.name.values[0],
+                    focus=selected_row.description.values[0],
+                    start_date=selected_row.start_date.values[0],
+                    end_date=selected_row.end_date.values[0],
+                    routine_uuids=selected_row.routines.values[0]
+                )
 
-    else:
-        if button_slot.button("Edit"):
             idx = periodiq_plan_df_selector.selection.rows
             selected_row = available_periodiq_plans.iloc[idx]
-            create_plan_modal(
-                plan_id=int(selected_row.id.values[0]),
-                name=selected_row.name.values[0],
-                focus=selected_row.description.values[0],
-                start_date=selected_row.start_date.values[0],
-                end_date=selected_row.end_date.values[0],
-                routine_uuids=selected_row.routines.values[0]
-            )
+            dfs = get_workout_dfs_for_periodiq_plan(int(selected_row.id.values[0]))
+            for g, df in dfs.items():
+                st.write(g)
+                st.dataframe(
+                    df,
+                    column_config={
+                        "_index": st.column_config.Column("Exercise", width="medium")
+                    },
+                    use_container_width=False
+                )
 
-        idx = periodiq_plan_df_selector.selection.rows
-        selected_row = available_periodiq_plans.iloc[idx]
-        dfs = get_workout_dfs_for_periodiq_plan(int(selected_row.id.values[0]))
-        for g, df in dfs.items():
-            st.write(g)
-            st.dataframe(
-                df,
-                column_config={
-                    "_index": st.column_config.Column("Exercise", width="medium")
-                },
-                use_container_width=False
-            )
 
+    with workout_view:
 
-with workout_view:
-
-    show_cols = ['title', 'start_time', 'end_time']
-
-    workout_df = data_utils.workouts_to_df()
-
-    column_configuration = {
-        "title": st.column_config.TextColumn(
-            "Title", max_chars=100, width="medium"
-        ),
-        "start_time": st.column_config.DatetimeColumn(
-            "Start Time",
-            width="medium",
-        ),
-        "end_time": st.column_config.DatetimeColumn(
-            "End Time",
-            width="medium",
-        ),
-    }
-
-    workouts = st.dataframe(
-        workout_df[show_cols],
-        column_config=column_configuration,
-        use_container_width=True,
-        hide_index=True,
-        on_select="rerun",
-        selection_mode="multi-row",
-        height=200
-    )
+        show_cols = ['title', 'start_time', 'end_time']
 
-    selected_workouts = workouts.selection.rows
-    filtered_df = workout_df[["uuid"] + show_cols].iloc[selected_workouts]
-
-    uuids = list(filtered_df.uuid.unique())
-
-    if len(filtered_df) > 0:
-        dfs = get_workouts_by_routine_dfs(uuids)
-        for g, df in dfs.items():
-            st.write(g)
-            st.dataframe(
-                df,
-                column_config={
-                    "_index": st.column_config.Column("Exercise", width="medium")
-                },
-                use_container_width=False
-            )
+        with st_horizontal():
+            title_filter = st.text_input("Title", placeholder="Filter by title", label_visibility="collapsed")
+            date_filter = st.date_input("Date range", (), format="MM/DD/YYYY", label_visibility="collapsed")
+
+        workout_filters = {
+            "start_date": date_filter[0] if len(date_filter) > 0 else None,
+            "end_date": date_filter[1] if len(date_filter) > 1 else None,
+            "title": title_filter.strip() or None,
+        }
+        # start over with one page whenever the filters change
+        if st.session_state.get("workout_filters") != workout_filters:
+            st.session_state.workout_filters = workout_filters
+            st.session_state.workout_pages = 1
+
+        workout_df = data_utils.get_workouts_pages(st.session_state.workout_pages, **workout_filters)
+        workout_count = data_utils.count_workouts(**workout_filters)
+
+        column_configuration = {
+            "title": st.column_config.TextColumn(
+                "Title", max_chars=100, width="medium"
+            ),
+            "start_time": st.column_config.DatetimeColumn(
+                "Start Time",
+                width="medium",
+            ),
+            "end_time": st.column_config.DatetimeColumn(
+                "End Time",
+                width="medium",
+            ),
+        }
+
+        workouts = st.dataframe(
+            workout_df[show_cols],
+            column_config=column_configuration,
+            use_container_width=True,
+            hide_index=True,
+            on_select="rerun",
+            selection_mode="multi-row",
+            height=200
+        )
 
+        if len(workout_df) < workout_count:
+            def _load_more_workouts():
+                st.session_state.workout_pages += 1
 
-with exercise_view:
-    today = date.today()
-    past_90 = today - timedelta(days=90)
-
-    date_range = st.date_input(
-        "Date range",
-        (past_90, today),
-        max_value=today,
-        format="MM/DD/YYYY",
-        label_visibility="hidden"
-    )
+            st.button(f"Load more ({len(workout_df)} of {workout_count})", on_click=_load_more_workouts)
 
-    time_range_uuids = get_workout_uuids_in_time_range(date_range[0], date_range[1])
-    exercise_name_df = exercise_name_df(time_range_uuids)
+        selected_workouts = workouts.selection.rows
+        filtered_df = workout_df[["uuid"] + show_cols].iloc[selected_workouts]
 
-    exercises_df = st.dataframe(
-        exercise_name_df,
-        use_container_width=True,
-        hide_index=True,
-        on_select="rerun",
-        selection_mode="multi-row",
-        height=200
-    )
-    selected_exercises = exercises_df.selection.rows
+        uuids = list(filtered_df.uuid.unique())
+
+        if len(filtered_df) > 0:
+            dfs = get_workouts_by_routine_dfs(uuids)
+            for g, df in dfs.items():
+                st.write(g)
+                st.dataframe(
+                    df,
+                    column_config={
+                        "_index": st.column_config.Column("Exercise", width="medium")
+                    },
+                    use_container_width=False
+                )
+
+
+    with exercise_view:
+        past_90 = today - timedelta(days=90)
+
+        date_range = st.date_input(
+            "Date range",
+            (past_90, today),
+            max_value=today,
+            format="MM/DD/YYYY",
+            label_visibility="hidden"
+        )
+
+        exercise_name_df = get_exercise_names_df(date_range[0], date_range[1])
+
+        exercises_df = st.dataframe(
+            exercise_name_df,
+            use_container_width=True,
+            hide_index=True,
+            column_order=["Exercise"],
+            on_select="rerun",
+            selection_mode="multi-row",
+            height=200
+        )
+        selected_exercises = exercises_df.selection.rows
 
-    if selected_exercises:
-        ex_df = get_workouts_by_exercise_df(time_range_uuids)
-        ex_df_filtered = (
-            ex_df.loc[list(exercise_name_df.iloc[selected_exercises]['Exercise'])]
-            .dropna(axis=1, how='all')
+        if selected_exercises:
+            ex_df_filtered = get_workouts_by_exercise_df(
+                exercise_name_df.iloc[selected_exercises]['exercise_id'].tolist(),
+                date_range[0],
+                date_range[1]
+            )
+            ex_df_styled = style_df(ex_df_filtered)
+
+            if len(ex_df_filtered) > 0:
+                st.dataframe(
+                    ex_df_styled,
+                    column_config={
+                        "_index": st.column_config.Column("Exercise", width="medium")
+                    },
+                    use_container_width=False,
+                )
+
+
+    with settings_view:
+        sync_worker = get_sync_worker()
+
+        st.write("Fetch latest workout data from Hevy")
+        st.button(
+            label="Refresh data",
+            on_click=sync_worker.trigger
         )
-        ex_df_styled = style_df(ex_df_filtered)
-
-        if len(ex_df_filtered) > 0:
-            st.dataframe(
-                ex_df_styled,
-                column_config={
-                    "_index": st.column_config.Column("Exercise", width="medium")
-                },
-                use_container_width=False,
+
+        @st.fragment(run_every=2)
+        def sync_status():
+            status = sync_worker.status()
+            if status["running"]:
+                st.write(f"Syncing (started {status['started_at']:%H:%M:%S})")
+            if status["resources"]:
+                st.write(", ".join(f"{resource.replace('_', ' ')}: {state}"
+                                   for resource, state in status["resources"].items()))
+            if status["last_success_at"]:
+                st.write(f"Last successful sync: {status['last_success_at']:%Y-%m-%d %H:%M:%S} "
+                         f"({status['last_duration_s']:.1f}s)")
+            if status["last_error"]:
+                st.error(f"Last sync failed: {status['last_error']}")
+            if status["running_elsewhere_at"]:
+                st.info(f"Another process (e.g. main.py) is syncing, seen at "
+                        f"{status['running_elsewhere_at']:%H:%M:%S}. Syncing here once it is done.")
+
+        sync_status()
+
+        st.write("#### Diagnostics")
+        st.toggle(
+            "Collect query and function timings",
+            value=instrumentation.is_enabled(),
+            key="instrumentation_enabled",
+            on_change=lambda: (
+                instrumentation.enable() if st.session_state.instrumentation_enabled else instrumentation.disable()
             )
+        )
 
+        if instrumentation.is_enabled():
+            diagnostics = instrumentation.snapshot()
 
-with settings_view:
-    st.write("Fetch latest workout data from Hevy")
-    st.button(
-        label="Refresh data",
-        on_click=refresh_data
-    )
\ No newline at end of file
+            renders = pd.DataFrame(diagnostics["renders"])
+            if not renders.empty:
+                st.write("Recent renders")
+                st.dataframe(renders.iloc[::-1], hide_index=True, use_container_width=True)
+
+            functions = pd.DataFrame(diagnostics["functions"])
+            if not functions.empty:
+                st.write("Functions")
+                st.dataframe(
+                    functions.sort_values("total_s", ascending=False), hide_index=True, use_container_width=True
+                )
+
+            queries = pd.DataFrame(diagnostics["queries"])
+            if not queries.empty:
+                st.write("Queries")
+                st.dataframe(
+                    queries.sort_values("total_s", ascending=False), hide_index=True, use_container_width=True
+                )
+
+            with st_horizontal():
+                st.download_button(
+                    "Download JSON",
+                    data=instrumentation.dump_json(),
+                    file_name=f"periodiq-diagnostics-{date.today()}.json",
+                    mime="application/json"
+                )
+                st.button("Reset", on_click=instrumentation.reset)
+finally:
+    instrumentation.finish_render(render)
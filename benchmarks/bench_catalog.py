@@ -0,0 +1,54 @@
+"""
+Compares the list-scan + add_all exercise template sync with the set-based
+upsert in sync_exercise_templates. Half of the catalog is stored up front.
+
+    python -m benchmarks.bench_catalog [n_templates]
+"""
+import sys
+import time
+
+from sqlalchemy import select
+
+from benchmarks.fixtures import temp_sessionmaker
+from src.db.models import ExerciseTemplate
+from src.hevy.ingest import sync_exercise_templates
+from src.hevy.utils import parse_exercise_template
+
+
+def make_templates(n: int) -> list[dict]:
+    return [
+        {
+            "id": f"template-{i:06d}",
+            "title": f"Exercise {i}",
+            "type": "weight_reps",
+            "primary_muscle_group": "chest",
+            "secondary_muscle_groups": ["triceps", "shoulders"],
+            "is_custom": i % 10 == 0,
+        }
+        for i in range(n)
+    ]
+
+
+def list_scan_sync(session, templates):
+    existing_uuids = session.execute(select(ExerciseTemplate.uuid).distinct()).scalars().all()
+    templates = [e for e in templates if e["id"] not in existing_uuids]
+    session.add_all([parse_exercise_template(e) for e in templates])
+
+
+def main(n: int = 20_000):
+    templates = make_templates(n)
+
+    for name, fn in [("list scan", list_scan_sync), ("upsert", sync_exercise_templates)]:
+        session_factory = temp_sessionmaker()
+        with session_factory() as session, session.begin():
+            sync_exercise_templates(session, templates[: n // 2])
+
+        start = time.perf_counter()
+        with session_factory() as session, session.begin():
+            fn(session, templates)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>10}: {elapsed:7.2f}s  ({n} templates, {n // 2} stored)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
@@ -0,0 +1,92 @@
+"""
+Checks the vectorized e1RM history and rep-max table (src/e1rm.py) against
+a per-set Python loop and against the daily summary, and times both over
+years of synthetic workouts.
+
+    python -m benchmarks.bench_e1rm [n_workouts]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from benchmarks.fixtures import temp_sessionmaker
+from src import e1rm
+from src.db.models import ExerciseDailySummary, Exercise
+from src.db.summary import rebuild_exercise_daily_summary
+from src.hevy.ingest import bulk_insert_workouts
+from tests.factories import make_workouts
+
+
+def per_set_loop(rows, formula: str):
+    """Reference: session bests, running bests and rep maxes from plain dicts."""
+    estimate = e1rm.FORMULAS[formula]
+    sessions, rep_maxes = {}, {}
+    for exercise_id, workout, _, weight, reps in rows:
+        value = float(estimate(np.float64(weight), np.int64(reps)))
+        key = (exercise_id, workout)
+        if not np.isnan(value):
+            sessions[key] = max(sessions.get(key, value), value)
+        else:
+            sessions.setdefault(key, np.nan)
+        if reps <= e1rm.MAX_REP_MAX:
+            rep_key = (exercise_id, reps)
+            rep_maxes[rep_key] = max(rep_maxes.get(rep_key, weight), weight)
+
+    best, running = [], {}
+    for (exercise_id, _), value in sessions.items():
+        if not np.isnan(value):
+            running[exercise_id] = max(running.get(exercise_id, value), value)
+        best.append(running.get(exercise_id, np.nan))
+    return [v for v in sessions.values()], best, rep_maxes
+
+
+def main(n: int = 3_000):
+    session_factory = temp_sessionmaker()
+    with session_factory() as session, session.begin():
+        bulk_insert_workouts(session, make_workouts(n))
+        rebuild_exercise_daily_summary(session)
+
+    with session_factory() as session:
+        titles = dict(session.execute(select(Exercise.id, Exercise.title)).all())
+        start = time.perf_counter()
+        rows = session.execute(e1rm._sets_stmt(list(titles), None, None)).all()
+        query_s = time.perf_counter() - start
+        summary = session.execute(
+            select(ExerciseDailySummary.exercise_id, ExerciseDailySummary.day, ExerciseDailySummary.best_one_rep_max)
+        ).all()
+    print(f"query: {query_s:6.3f}s  ({len(rows)} sets, {n} workouts)")
+
+    for formula in e1rm.FORMULAS:
+        start = time.perf_counter()
+        sets = e1rm._set_arrays(rows, titles)
+        history = e1rm.session_best(sets, formula)
+        table = e1rm.rep_max_table(sets)
+        vectorized_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        session_e1rm, best, rep_maxes = per_set_loop(rows, formula)
+        loop_s = time.perf_counter() - start
+        print(f"{formula:>9}: vectorized {vectorized_s:6.3f}s, per-set loop {loop_s:6.3f}s")
+
+        np.testing.assert_allclose(history["e1rm"].to_numpy(), session_e1rm)
+        np.testing.assert_allclose(history["best_e1rm"].to_numpy(), best)
+        for (exercise_id, reps), weight in rep_maxes.items():
+            assert table.at[titles[exercise_id], reps] == weight
+        assert table.notna().sum().sum() == len(rep_maxes)
+
+    # Epley session bests agree with the daily summary
+    history = e1rm.session_best(e1rm._set_arrays(rows, titles))
+    history["day"] = history["start_time"].dt.date
+    daily = history.groupby(["exercise", "day"])["e1rm"].max()
+    expected = pd.Series(
+        {(titles[exercise_id], day): value for exercise_id, day, value in summary},
+    ).sort_index()
+    np.testing.assert_allclose(daily.sort_index().to_numpy(), expected.to_numpy())
+    print(f"parity ok: {len(history)} sessions, {len(daily)} exercise days")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3_000)
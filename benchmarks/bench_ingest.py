@@ -0,0 +1,67 @@
+"""
+Compares the ORM add_all path with the bulk Core insert path.
+
+    python -m benchmarks.bench_ingest [n_workouts]
+"""
+import sys
+import time
+
+from sqlalchemy import select, func
+
+from benchmarks.fixtures import temp_sessionmaker
+from src.db.models import Workout, WorkoutExercise, WorkoutSet
+from src.hevy.ingest import bulk_insert_workouts
+from src.hevy.utils import workout_row, workout_exercise_row, workout_set_row
+from tests.factories import make_workouts
+
+
+# ----- ORM path the bulk insert replaced, kept as the baseline -----
+# WorkoutExercise.exercise_id is left unset, the rows are only timed.
+
+def parse_workout(payload: dict) -> Workout:
+    workout = Workout(**workout_row(payload))
+
+    # ----- nested exercises -----
+    for ex in payload.get("exercises", []):
+        exercise = WorkoutExercise(**workout_exercise_row(ex))
+
+        # ----- nested sets -----
+        for st in ex.get("sets", []):
+            exercise.sets.append(WorkoutSet(**workout_set_row(st)))
+
+        workout.exercises.append(exercise)
+
+    return workout
+
+
+def sort_workouts(workouts: list[Workout]):
+    return sorted(workouts, key=lambda w: w.start_time)
+
+
+def orm_insert(session_factory, payloads):
+    with session_factory() as session:
+        session.add_all(sort_workouts([parse_workout(w) for w in payloads]))
+        session.commit()
+
+
+def bulk_insert(session_factory, payloads):
+    with session_factory() as session, session.begin():
+        bulk_insert_workouts(session, payloads)
+
+
+def main(n: int = 10_000):
+    payloads = make_workouts(n)
+
+    for name, fn in [("orm add_all", orm_insert), ("bulk core", bulk_insert)]:
+        session_factory = temp_sessionmaker()
+        start = time.perf_counter()
+        fn(session_factory, payloads)
+        elapsed = time.perf_counter() - start
+
+        with session_factory() as session:
+            n_sets = session.execute(select(func.count(WorkoutSet.id))).scalar()
+        print(f"{name:>12}: {elapsed:7.2f}s  ({n} workouts, {n_sets} sets)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -0,0 +1,104 @@
+"""
+Checks the weekly sets and volume per muscle group (one grouped query over
+exercise_daily_summary and exercise_template_muscle_group) against decoding
+the template JSON for every set in Python, and times both over the whole
+synthetic history.
+
+    python -m benchmarks.bench_muscle_groups [n_workouts]
+"""
+import sys
+import time
+from datetime import timedelta
+
+import pandas as pd
+from sqlalchemy import select, func
+
+from benchmarks.fixtures import temp_sessionmaker
+from src.data_utils import _weekly_muscle_group_stmt
+from src.db.models import Workout, WorkoutExercise, WorkoutSet, ExerciseTemplate
+from src.db.summary import rebuild_exercise_daily_summary
+from src.hevy.ingest import bulk_insert_workouts, sync_exercise_templates
+from tests.factories import EXERCISES, make_workouts
+
+MUSCLES = {
+    "Squat (Barbell)": ("quadriceps", ["glutes", "hamstrings", "lower_back"]),
+    "Bench Press (Barbell)": ("chest", ["triceps", "shoulders"]),
+    "Deadlift (Barbell)": ("hamstrings", ["glutes", "lower_back", "hamstrings"]),
+    "Overhead Press (Barbell)": ("shoulders", ["triceps", "triceps"]),
+    "Bent Over Row (Barbell)": ("upper_back", ["biceps", "lats"]),
+    # Pull Up has no template and is left out
+}
+
+
+def make_templates() -> list[dict]:
+    return [
+        {
+            "id": template_id,
+            "title": title,
+            "type": "weight_reps",
+            "primary_muscle_group": MUSCLES[title][0],
+            "secondary_muscle_groups": MUSCLES[title][1],
+            "is_custom": False,
+        }
+        for title, template_id in EXERCISES if title in MUSCLES
+    ]
+
+
+def per_row_json(session, start_date, end_date, primary_weight, secondary_weight) -> pd.DataFrame:
+    """Reference: reads every set and the template JSON, weights and buckets in Python."""
+    templates = {
+        t.uuid: (t.primary_muscle_group, t.secondary_muscle_groups or [])
+        for t in session.execute(select(ExerciseTemplate)).scalars()
+    }
+    stmt = (
+        select(Workout.start_time, WorkoutExercise.exercise_template_id, WorkoutSet.weight_kg, WorkoutSet.reps)
+        .join(WorkoutExercise, WorkoutExercise.id == WorkoutSet.workout_exercise_id)
+        .join(Workout, Workout.id == WorkoutExercise.workout_id)
+        .where(Workout.start_time >= start_date, Workout.start_time < end_date)
+    )
+    totals = {}
+    for start_time, template_id, weight_kg, reps in session.execute(stmt):
+        if template_id not in templates:
+            continue
+        primary, secondary = templates[template_id]
+        week_start = (start_time.date() - timedelta(days=start_time.weekday())).isoformat()
+        muscles = {primary: primary_weight}
+        for muscle in secondary:
+            muscles.setdefault(muscle, secondary_weight)
+        for muscle, weight in muscles.items():
+            sets, volume = totals.get((week_start, muscle), (0.0, 0.0))
+            totals[(week_start, muscle)] = (sets + weight, volume + weight * (weight_kg or 0) * (reps or 0))
+    return pd.DataFrame(
+        [(week, muscle, sets, volume) for (week, muscle), (sets, volume) in sorted(totals.items())],
+        columns=["week_start", "muscle_group", "sets", "volume_kg"]
+    )
+
+
+def main(n: int = 3_000):
+    session_factory = temp_sessionmaker()
+    with session_factory() as session, session.begin():
+        sync_exercise_templates(session, make_templates())
+        bulk_insert_workouts(session, make_workouts(n))
+        rebuild_exercise_daily_summary(session)
+
+    with session_factory() as session:
+        first, last = session.execute(select(func.min(Workout.start_time), func.max(Workout.start_time))).one()
+        start_date, end_date = first.date(), last.date() + timedelta(days=1)
+
+        start = time.perf_counter()
+        result = session.execute(_weekly_muscle_group_stmt(start_date, end_date, 1.0, 0.5))
+        grouped = pd.DataFrame(result.all(), columns=list(result.keys()))
+        grouped_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        reference = per_row_json(session, start_date, end_date, 1.0, 0.5)
+        reference_s = time.perf_counter() - start
+
+    print(f"grouped query: {grouped_s:6.3f}s, per-row JSON: {reference_s:6.3f}s  "
+          f"({n} workouts, {(end_date - start_date).days // 7} weeks)")
+    pd.testing.assert_frame_equal(grouped, reference, check_dtype=False)
+    print(f"parity ok: {len(grouped)} week x muscle group rows")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3_000)
@@ -0,0 +1,58 @@
+"""
+Checks that the vectorized set pivot (workout_sets_pivot) builds the same
+tables as the per-set loop it replaced and compares their run time, for the
+Exercises table and the per-day tables of the Workouts tab.
+
+    python -m benchmarks.bench_pivot [n_workouts]
+"""
+import sys
+import time
+
+import pandas as pd
+from sqlalchemy import select
+
+from benchmarks.fixtures import temp_sessionmaker
+from src.db.models import Workout
+from src.hevy.ingest import bulk_insert_workouts
+from tests.factories import make_workouts
+from tests.pivot_reference import legacy, vectorized
+
+
+def make_payloads(n: int) -> list[dict]:
+    payloads = make_workouts(n)
+    for i, payload in enumerate(payloads):
+        # uneven set counts, missing weights and untitled days
+        if i % 3 == 0:
+            payload["exercises"][0]["sets"].pop()
+        if i % 7 == 0:
+            payload["exercises"][1]["sets"][0]["weight_kg"] = None
+        if i % 11 == 0:
+            payload["title"] = "Extra session"
+    return payloads
+
+
+def main(n: int = 1_000):
+    session_factory = temp_sessionmaker()
+    with session_factory() as session, session.begin():
+        bulk_insert_workouts(session, make_payloads(n))
+
+    with session_factory() as session:
+        uuids = session.execute(select(Workout.uuid)).scalars().all()
+
+        results = {}
+        for name, fn in [("legacy loop", legacy), ("vectorized", vectorized)]:
+            start = time.perf_counter()
+            results[name] = fn(session, uuids)
+            elapsed = time.perf_counter() - start
+            print(f"{name:>12}: {elapsed:7.2f}s  ({n} workouts)")
+
+    (legacy_df, legacy_days), (new_df, new_days) = results["legacy loop"], results["vectorized"]
+    pd.testing.assert_frame_equal(new_df, legacy_df)
+    assert list(new_days) == list(legacy_days)
+    for day in legacy_days:
+        pd.testing.assert_frame_equal(new_days[day], legacy_days[day])
+    print(f"parity ok: {new_df.shape} table, {len(new_days)} days")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000)
@@ -0,0 +1,78 @@
+"""
+Compares allocations and run time of the ORM + orm_to_dict read path with
+the flat Core SELECT path (_workout_sets_stmt, select on the table) for the
+workout details and the workouts listing.
+
+    python -m benchmarks.bench_read_path [n_workouts]
+"""
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from benchmarks.fixtures import temp_sessionmaker
+from src.data_utils import _workout_sets_stmt
+from src.db.models import Workout, WorkoutExercise
+from src.hevy.ingest import bulk_insert_workouts
+from tests.factories import make_workouts
+from tests.pivot_reference import orm_to_dict
+
+
+def orm_details(session):
+    stmt = (
+        select(Workout)
+        .order_by(Workout.start_time)
+        .options(selectinload(Workout.exercises).selectinload(WorkoutExercise.sets))
+    )
+    return [orm_to_dict(w) for w in session.execute(stmt).scalars().all()]
+
+
+def flat_details(session):
+    result = session.execute(_workout_sets_stmt())
+    return pd.DataFrame(result.all(), columns=list(result.keys()))
+
+
+def orm_listing(session):
+    workouts = session.execute(select(Workout).order_by(Workout.start_time.desc())).scalars().all()
+    return pd.DataFrame([{col.name: getattr(w, col.name) for col in Workout.__table__.columns} for w in workouts])
+
+
+def flat_listing(session):
+    result = session.execute(select(Workout.__table__).order_by(Workout.start_time.desc()))
+    return pd.DataFrame(result.all(), columns=list(result.keys()))
+
+
+def measure(session_factory, fn) -> tuple[float, int, int]:
+    """Seconds, peak traced bytes and number of traced blocks alive while the result is held."""
+    with session_factory() as session:
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = fn(session)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+        tracemalloc.stop()
+        del result
+    return elapsed, peak, blocks
+
+
+def main(n: int = 2_000):
+    session_factory = temp_sessionmaker()
+    with session_factory() as session, session.begin():
+        bulk_insert_workouts(session, make_workouts(n))
+
+    for name, fn in [
+        ("orm details", orm_details),
+        ("flat details", flat_details),
+        ("orm listing", orm_listing),
+        ("flat listing", flat_listing),
+    ]:
+        elapsed, peak, blocks = measure(session_factory, fn)
+        print(f"{name:>13}: {elapsed:6.2f}s  peak {peak / 2 ** 20:7.1f} MiB  {blocks:>9} blocks  ({n} workouts)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2_000)
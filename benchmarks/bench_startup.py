@@ -0,0 +1,61 @@
+"""
+Cold-start import time of the app and of main.py, measured with
+`python -X importtime` in fresh interpreters. Reports the median over
+several runs of the total import time and wall time, and the import
+time per top-level package of the last run.
+
+The app target imports the src modules app.py imports, without streamlit
+itself (app.py can only run inside `streamlit run`).
+
+    python -m benchmarks.bench_startup [runs]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from src.config import ROOT_DIR
+
+TARGETS = {
+    "app": "from src import data_utils, instrumentation; import src.db.migrations, src.hevy.worker",
+    "main": "import main",
+}
+
+
+def import_times(code: str) -> tuple[float, float, dict[str, int]]:
+    """Wall seconds, total import seconds and import microseconds per top-level package."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT_DIR, env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+        capture_output=True, text=True, check=True
+    )
+    wall = time.perf_counter() - start
+
+    packages: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(self_us)
+    return wall, sum(packages.values()) / 1e6, packages
+
+
+def main(runs: int = 5):
+    for target, code in TARGETS.items():
+        walls, totals = [], []
+        for _ in range(runs):
+            wall, total, packages = import_times(code)
+            walls.append(wall)
+            totals.append(total)
+
+        print(f"{target}: imports {statistics.median(totals) * 1000:6.0f} ms, "
+              f"wall {statistics.median(walls) * 1000:6.0f} ms (median of {runs})")
+        for package, us in sorted(packages.items(), key=lambda item: -item[1])[:8]:
+            print(f"    {us / 1000:7.1f} ms  {package}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
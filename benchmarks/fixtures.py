@@ -0,0 +1,16 @@
+import os
+import tempfile
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.db.migrations import migrate
+
+
+def temp_sessionmaker() -> sessionmaker:
+    """Sessionmaker bound to a fresh SQLite file with the current schema."""
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    engine = create_engine(f"sqlite:///{path}")
+    migrate(engine)
+    return sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
@@ -1,6 +1,14 @@
-from src.hevy.api import HevyAPI
-from src.hevy.updater import insert_workouts, get_most_recent_update, process_new_workout_events
+import logging
 
-# workouts = HevyAPI.get_workouts()
-# insert_workouts(workouts)
+from src.db.migrations import check_schema
+from src.hevy.worker import SyncWorker
+
+# single steps, from src.hevy.updater:
+# backfill_workouts()
 # process_new_workout_events()
+
+if __name__ == "__main__":
+    # Standalone sync process, runs every PERIODIQ_SYNC_INTERVAL_MINUTES
+    logging.basicConfig(level=logging.INFO)
+    check_schema()
+    SyncWorker().run_forever()
@@ -0,0 +1,23 @@
+import argparse
+import logging
+import sys
+
+from src.db.migrations import migrate, check_schema, get_schema_version, SchemaVersionError, SCHEMA_VERSION
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upgrade the Periodiq database schema.")
+    parser.add_argument("--check", action="store_true", help="only check the schema version")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.check:
+        try:
+            check_schema()
+        except SchemaVersionError as e:
+            print(e)
+            sys.exit(1)
+        print(f"Database schema is up to date (version {SCHEMA_VERSION}).")
+    else:
+        version = get_schema_version()
+        print(f"Database schema migrated from version {version} to {migrate()}.")
@@ -0,0 +1,138 @@
+"""
+Process-wide cache for the read functions in src/data_utils.py.
+
+Streamlit reruns the whole script on every interaction, and the module
+level cache is shared by all browser sessions of the app process. Entries
+are keyed on the function, its arguments and the data version, which is
+bumped whenever the database changes (refresh_data, plan writes), so
+stale results are never returned after a write in this process. Writes
+from another process (a sync started with main.py) show up once the
+entries expire after PERIODIQ_QUERY_CACHE_TTL_SECONDS.
+
+Every call returns a copy of the cached value's frames and containers
+(see _copy), so callers may modify what they get. Results that depend on
+the current date take it as an argument, so it is part of the key.
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Hashable
+
+from src.config import setting
+
+_version_lock = threading.Lock()
+_data_version = 0
+
+
+class QueryCache:
+    """LRU cache with a maximum size and a time to live per entry."""
+
+    maxsize = setting("PERIODIQ_QUERY_CACHE_SIZE", 128, int)
+    ttl = setting("PERIODIQ_QUERY_CACHE_TTL_SECONDS", 600.0, float)
+
+    def __init__(self, maxsize: int | None = None, ttl: float | None = None):
+        if maxsize is not None:
+            self.maxsize = maxsize
+        if ttl is not None:
+            self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: Hashable) -> tuple[bool, Any]:
+        """Returns (True, value) on a hit and (False, None) otherwise."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return True, entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self._misses += 1
+            return False, None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self._hits, "misses": self._misses}
+
+
+QUERY_CACHE = QueryCache()
+
+
+def data_version() -> int:
+    return _data_version
+
+
+def bump_data_version() -> int:
+    """Marks all cached results as stale. Call after every committed write."""
+    global _data_version
+    with _version_lock:
+        _data_version += 1
+        version = _data_version
+    # entries of older versions can never be hit again
+    QUERY_CACHE.clear()
+    return version
+
+
+def _freeze(value: Any) -> Hashable:
+    """Hashable stand-in for lists, sets and dicts in arguments."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def _copy(value: Any) -> Any:
+    """
+    Copy of a cached value: dicts and lists are rebuilt, anything with a
+    copy() method (DataFrame, Series, ndarray, set) is copied, other values
+    are expected to be immutable. Don't cache objects that wrap a frame
+    without copy(), like a pandas Styler; cache the frame instead.
+    """
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    copy = getattr(value, "copy", None)
+    return copy() if callable(copy) else value
+
+
+def cached(fn: Callable) -> Callable:
+    """
+    Caches fn in QUERY_CACHE, keyed on its arguments and the data version.
+    The uncached function stays available as fn.uncached.
+    """
+    name = f"{fn.__module__}.{fn.__qualname__}"
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        # the version is read before querying, a result computed while a
+        # write commits is stored under the old version and never served
+        key = (name, data_version(), _freeze(args), _freeze(kwargs))
+        hit, value = QUERY_CACHE.get(key)
+        if not hit:
+            value = fn(*args, **kwargs)
+            QUERY_CACHE.put(key, value)
+        return _copy(value)
+
+    wrapper.uncached = fn
+    return wrapper
@@ -1,5 +1,67 @@
 import os
-from dotenv import dotenv_values
+from collections.abc import Mapping
+from typing import Any, Callable, Iterator
 
 ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname( __file__ ), '..'))
-CONFIG = dotenv_values(ROOT_DIR + '/.env', verbose=True)
+
+
+class _Config(Mapping):
+    """Values from .env, read on first access instead of at import."""
+
+    def __init__(self, path: str):
+        self._path = path
+        self._values: dict[str, str | None] | None = None
+
+    def _load(self) -> dict[str, str | None]:
+        if self._values is None:
+            from dotenv import dotenv_values
+            self._values = dotenv_values(self._path, verbose=True)
+        return self._values
+
+    def __getitem__(self, key: str) -> str | None:
+        return self._load()[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._load())
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+
+CONFIG = _Config(ROOT_DIR + '/.env')
+
+_REQUIRED = object()
+
+
+def flag(value: str | None) -> bool:
+    return (value or "").lower() in ("1", "true", "yes")
+
+
+class setting:
+    """
+    Class attribute read from CONFIG on first access, e.g.
+    `MAX_RETRIES = setting("HEVY_MAX_RETRIES", 5, int)`. Empty values fall
+    back to the default, a setting without default raises KeyError when
+    unset. Assigning to the attribute (on the class or an instance)
+    overrides it.
+    """
+
+    def __init__(self, key: str, default: Any = _REQUIRED, cast: Callable[[str], Any] = str):
+        self.key = key
+        self.default = default
+        self.cast = cast
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.name = name
+
+    def __get__(self, obj: Any, owner: type) -> Any:
+        raw = CONFIG.get(self.key)
+        if raw:
+            value = self.cast(raw)
+        elif self.default is _REQUIRED:
+            raise KeyError(self.key)
+        else:
+            value = self.default
+        # cache on the class, later reads are plain attribute lookups
+        setattr(owner, self.name, value)
+        return value
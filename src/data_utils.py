@@ -1,113 +1,138 @@
 from datetime import datetime, date, timedelta
-from typing import Sequence
 
+import numpy as np
 import pandas as pd
-from sqlalchemy import select, func
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, func, and_, case, tuple_, Select
 
+from src import e1rm
+from src.cache import cached, bump_data_version
 from src.db.connection import SessionLocal
-from src.db.models import Workout, WorkoutExercise, WorkoutSet, Routine, PeriodiqPlan, PeriodiqPlanRoutine
-from src.db.utils import orm_to_dict
+from src.db.models import Workout, WorkoutExercise, WorkoutSet, Routine, PeriodiqPlan, PeriodiqPlanRoutine, \
+    ExerciseDailySummary, ExerciseTemplateMuscleGroup, Exercise
+from src.instrumentation import timed
 
 UNCATEGORIZED = "UNCATEGORIZED"
 KG_TO_LBS = 2.20462
 
 
-def workouts_to_df() -> pd.DataFrame:
-    """Return the workouts table as a pandas DataFrame."""
+def _select_df(stmt: Select) -> pd.DataFrame:
+    """
+    Runs a Core SELECT and returns the rows as a DataFrame named after the
+    selected columns, without hydrating ORM objects. Datetimes stay native.
+    """
     with SessionLocal() as session:
-        stmt = select(Workout).order_by(Workout.start_time.desc())
-        workouts = session.execute(stmt).scalars().all()
+        result = session.execute(stmt)
+        return pd.DataFrame(result.all(), columns=list(result.keys()))
 
-        # turn each Workout into a dict of column -> value
-        rows = [
-            {col.name: getattr(w, col.name) for col in Workout.__table__.columns}
-            for w in workouts
-        ]
 
-    return pd.DataFrame(rows)
+# ----- workouts listing -----
 
+WORKOUTS_PAGE_SIZE = 50
 
-def get_workouts_with_details(uuids: list[str]) -> list[dict]:
-    with SessionLocal() as session:
-        stmt = (
-            select(Workout)
-            .where(Workout.uuid.in_(uuids))
-            .order_by(Workout.start_time)
-            .options(
-                selectinload(Workout.exercises)
-                .selectinload(WorkoutExercise.sets)
-            )
-        )
-        workouts = session.execute(stmt).scalars().all()
-        return [orm_to_dict(w) for w in workouts]
 
+def _workouts_filter(start_date: date | None, end_date: date | None, title: str | None) -> list:
+    """Filters of the workouts listing, the end date is inclusive."""
+    where = []
+    if start_date is not None:
+        where.append(Workout.start_time >= start_date)
+    if end_date is not None:
+        where.append(Workout.start_time < end_date + timedelta(1))
+    if title:
+        where.append(Workout.title.contains(title, autoescape=True))
+    return where
 
-def get_workouts_in_time_range(start_date: date, end_date: date) -> list[dict]:
-    with SessionLocal() as session:
-        stmt = (
-            select(Workout)
-            .where(Workout.start_time >= start_date)
-            .where(Workout.start_time <= end_date)
-            .order_by(Workout.start_time)
-            .options(
-                selectinload(Workout.exercises)
-                .selectinload(WorkoutExercise.sets)
-            )
-        )
-        workouts = session.execute(stmt).scalars().all()
-        return [orm_to_dict(w) for w in workouts]
 
+@timed
+@cached
+def get_workouts_page(
+    after: tuple[datetime, int] | None = None,
+    limit: int = WORKOUTS_PAGE_SIZE,
+    start_date: date | None = None,
+    end_date: date | None = None,
+    title: str | None = None
+) -> pd.DataFrame:
+    """
+    One page of workouts, most recent first. Pass the page_key of a page as
+    `after` to get the next one (keyset pagination on start_time and id, so
+    later pages cost the same as the first).
+    """
+    stmt = (
+        select(Workout.id, Workout.uuid, Workout.title, Workout.start_time, Workout.end_time)
+        .where(*_workouts_filter(start_date, end_date, title))
+        .order_by(Workout.start_time.desc(), Workout.id.desc())
+        .limit(limit)
+    )
+    if after is not None:
+        stmt = stmt.where(tuple_(Workout.start_time, Workout.id) < tuple_(*after))
+    return _select_df(stmt)
 
-def get_routines(routine_ids: set[str] | None) -> Sequence[Routine]:
-    with SessionLocal() as session:
-        stmt = (
-            select(Routine)
-            .order_by(Routine.created_at.desc())
-        )
-        if routine_ids is not None:
-            stmt = stmt.filter(Routine.uuid.in_(routine_ids))
-        return session.execute(stmt).scalars().all()
 
+def page_key(page: pd.DataFrame) -> tuple[datetime, int] | None:
+    """Position after the last row of a page, None for an empty page."""
+    if page.empty:
+        return None
+    last = page.iloc[-1]
+    return last.start_time.to_pydatetime(), int(last.id)
+
+
+@timed
+def get_workouts_pages(
+    n_pages: int,
+    start_date: date | None = None,
+    end_date: date | None = None,
+    title: str | None = None
+) -> pd.DataFrame:
+    """The first n_pages pages of the workouts listing, as one frame."""
+    pages = []
+    after = None
+    for _ in range(n_pages):
+        page = get_workouts_page(after, WORKOUTS_PAGE_SIZE, start_date, end_date, title)
+        if pages and page.empty:
+            break
+        pages.append(page)
+        if len(page) < WORKOUTS_PAGE_SIZE:
+            break
+        after = page_key(page)
+    return pd.concat(pages, ignore_index=True)
+
+
+@timed
+@cached
+def count_workouts(start_date: date | None = None, end_date: date | None = None, title: str | None = None) -> int:
+    with SessionLocal() as session:
+        stmt = select(func.count()).select_from(Workout).where(*_workouts_filter(start_date, end_date, title))
+        return session.execute(stmt).scalar()
 
-def get_routines_dict(fetch_relationships=False, routine_ids: set[str] | None = None) -> list[dict]:
-    routines = get_routines(routine_ids)
-    return [orm_to_dict(r, recurse_relationships=fetch_relationships) for r in routines]
 
+# ----- long-form set frames -----
 
-def get_periodiq_plans(fetch_relationships=False) -> list[dict]:
-    with SessionLocal() as session:
-        stmt = (
-            select(PeriodiqPlan)
-            .order_by(PeriodiqPlan.start_date.desc())
+def _workout_sets_stmt(*where) -> Select:
+    """
+    One row per set (or per exercise without sets), in workout, exercise and
+    set order. exercise is the current title of exercise_id, for display.
+    """
+    return (
+        select(
+            Workout.uuid.label("workout"),
+            Workout.title.label("workout_title"),
+            Workout.start_time,
+            WorkoutExercise.exercise_id,
+            Exercise.title.label("exercise"),
+            WorkoutExercise.index.label("exercise_index"),
+            WorkoutSet.index.label("set_index"),
+            WorkoutSet.weight_kg,
+            WorkoutSet.reps
         )
-        plans = session.execute(stmt).scalars().all()
-        return [orm_to_dict(p, recurse_relationships=fetch_relationships) for p in plans]
+        .join(WorkoutExercise, WorkoutExercise.workout_id == Workout.id)
+        .join(Exercise, Exercise.id == WorkoutExercise.exercise_id)
+        .outerjoin(WorkoutSet, WorkoutSet.workout_exercise_id == WorkoutExercise.id)
+        .where(*where)
+        .order_by(Workout.start_time, Workout.id, WorkoutExercise.index, WorkoutSet.index)
+    )
 
 
-def get_periodiq_plan(periodiq_plan_id: int) -> PeriodiqPlan | None:
-    with SessionLocal() as session:
-        stmt = (
-            select(PeriodiqPlan)
-            .where(PeriodiqPlan.id == periodiq_plan_id)
-            .options(
-                selectinload(PeriodiqPlan.routines)
-            )
-        )
-        return session.execute(stmt).scalar_one_or_none()
-
-
-def get_workout_uuids_in_time_range(start_date: date, end_date: date) -> list[str]:
-    with SessionLocal() as session:
-        stmt = (
-            select(Workout.uuid)
-            .where(
-                Workout.start_time >= start_date,
-                Workout.start_time <= end_date
-            )
-            .order_by(Workout.start_time)
-        )
-        return [x for x in session.execute(stmt).scalars().all()]
+def get_workout_sets_df(uuids: list[str]) -> pd.DataFrame:
+    return _select_df(_workout_sets_stmt(Workout.uuid.in_(uuids)))
 
 
 def get_workout_day(w):
@@ -122,112 +147,95 @@ def get_workout_day(w):
     return result
 
 
-def guess_order_of_workout_days(grouped):
-    def _earliest_time(workout_list):
-        return sorted(workout_list, key=lambda w: w['start_time'])[0]['start_time']
+def exercises_of_sets(sets: pd.DataFrame) -> list[int]:
+    """Exercise ids ordered by their position in the workouts, first seen first on ties."""
+    ordered = sets.sort_values("exercise_index", kind="stable")
+    return list(ordered["exercise_id"].drop_duplicates())
 
-    order = [
-        k for k, _ in
-        sorted(
-            [*grouped.items()],
-            key=lambda item: _earliest_time(item[1])
-        )
-    ]
 
-    # always put UNCATEGORIZED last
+def group_workout_sets(sets: pd.DataFrame, categorized_routines: set[str] | None = None) -> dict[str, pd.DataFrame]:
+    """
+    Splits a set frame by workout day (see get_workout_day), ordered by the
+    first workout of each day with UNCATEGORIZED last. With
+    categorized_routines, workouts with other titles are UNCATEGORIZED.
+    """
+    days = {}
+    for title in sets["workout_title"].unique():
+        day = get_workout_day({"title": title})
+        if categorized_routines is not None and title not in categorized_routines:
+            day = UNCATEGORIZED
+        days[title] = day
+    groups = sets["workout_title"].map(days)
+
+    order = list(groups.unique())
     if UNCATEGORIZED in order:
         order.remove(UNCATEGORIZED)
         order.append(UNCATEGORIZED)
 
-    return order
-
-
-def group_and_sort_workouts(workouts, categorized_routines: set[str] | None):
-    grouped_workouts = {}
-    for workout in workouts:
-        workout_day = get_workout_day(workout)
-        if categorized_routines is not None:
-            # If categorized_routines is provided, only categorize those workouts
-            if workout.get("title") not in categorized_routines:
-                workout_day = UNCATEGORIZED
-        if workout_day in grouped_workouts:
-            grouped_workouts[workout_day].append(workout)
-        else:
-            grouped_workouts[workout_day] = [workout]
-    for group in grouped_workouts.keys():
-        grouped_workouts[group] = sorted(grouped_workouts[group], key=lambda w: w["start_time"])
-    return grouped_workouts
-
-
-def exercises_of_workouts(workouts):
-    exercises = []
-    for w in workouts:
-        exercises.extend(w['exercises'])
-    sorted_exercises = sorted(exercises, key=lambda e: e["index"])
-    return list(dict.fromkeys([e["title"] for e in sorted_exercises]))
-
-
-def exercises_of_group(grouped):
-    return {
-        group: exercises_of_workouts(workouts)
-        for group, workouts in grouped.items()
-    }
-
-
-def _get_exercise_from_workout(exercise, workout):
-    for gex in workout['exercises']:
-        if exercise == gex['title']:
-            return gex
-    return None
-
-
-def _pretty_timestamp(iso_string: str):
-    dt_object = datetime.fromisoformat(iso_string)
-    return dt_object.strftime("%Y-%m-%d %H:%M")
-
+    return {g: sets[groups == g] for g in order}
 
-def _get_max_sets_for_workout(workout):
-    return max([len(e['sets']) for e in workout['exercises']])
 
+def workout_sets_pivot(sets: pd.DataFrame, exercise_ids: list[int] | None = None) -> pd.DataFrame:
+    """
+    Pivots a set frame into one row per exercise and two columns per set of
+    each workout, (start time, "W n") with the weight in lbs and
+    (start time, "R n") with the reps. Rows are keyed on exercise_id and
+    labelled with the exercise title. Only the first occurrence of an
+    exercise counts within a workout, missing sets are <NA>.
+    """
+    if exercise_ids is None:
+        exercise_ids = exercises_of_sets(sets)
+    titles = dict(zip(sets["exercise_id"], sets["exercise"]))
+    exercises = [titles.get(exercise_id, exercise_id) for exercise_id in exercise_ids]
+
+    first_index = sets.groupby(["workout", "exercise_id"])["exercise_index"].transform("min")
+    sets = sets[
+        (sets["exercise_index"] == first_index)
+        & sets["exercise_id"].isin(exercise_ids)
+        & sets["set_index"].notna()
+    ]
+    if sets.empty:
+        return pd.DataFrame(index=exercises, dtype="Int64")
+
+    workout_codes, workouts = pd.factorize(sets["workout"])
+    set_numbers = sets.groupby(["workout", "exercise_id"]).cumcount().to_numpy() + 1
+    long = pd.DataFrame({
+        "exercise_id": np.tile(sets["exercise_id"].to_numpy(), 2),
+        "workout": np.tile(workout_codes, 2),
+        "set": np.tile(set_numbers, 2),
+        "kind": np.repeat([0, 1], len(sets)),
+        "value": np.concatenate([
+            np.trunc(sets["weight_kg"].fillna(0).to_numpy(dtype=float) * KG_TO_LBS),
+            sets["reps"].fillna(0).to_numpy(dtype=float)
+        ])
+    })
+
+    wide = (
+        long.pivot(index="exercise_id", columns=["workout", "set", "kind"], values="value")
+        .reindex(index=exercise_ids)
+        .sort_index(axis=1)
+    )
 
-def get_workout_df_for_routine(exercises, workouts):
-    rows = {e: [] for e in exercises}
-    columns_set = set()
-    columns = []
+    # astype("Int64") converts column by column through object arrays,
+    # wrapping the float block is much cheaper on wide tables
+    values = wide.to_numpy()
+    mask = np.isnan(values)
+    ints = np.where(mask, 0, values).astype("int64")
+    df = pd.DataFrame(
+        {i: pd.arrays.IntegerArray(ints[:, i], mask[:, i]) for i in range(values.shape[1])},
+        index=exercises
+    )
 
-    for workout in workouts:
-        start_time = _pretty_timestamp(workout['start_time'])
-        max_sets = _get_max_sets_for_workout(workout)
-
-        for ex in exercises:
-            gex = _get_exercise_from_workout(ex, workout)
-            set_values = []
-            if gex:
-                for idx, s in enumerate(gex['sets']):
-                    col_name1 = (start_time, f'W {idx + 1}')
-                    col_name2 = (start_time, f'R {idx + 1}')
-
-                    if col_name1 not in columns_set:
-                        columns_set.add(col_name1)
-                        columns.append(col_name1)
-                    if col_name2 not in columns_set:
-                        columns_set.add(col_name2)
-                        columns.append(col_name2)
-
-                    weight_kg = s.get('weight_kg') or 0
-                    reps = s.get('reps') or 0
-
-                    set_values.append(int(weight_kg * KG_TO_LBS))
-                    set_values.append(int(reps))
-
-            n_none_sets = max_sets * 2 - len(set_values)
-            set_values.extend([None] * n_none_sets)
-            rows[ex].extend(set_values)
-
-    df = pd.DataFrame.from_dict(data=rows, orient='index').astype('Int64')
-    pd.set_option('display.max_rows', None)
-    pd.set_option('display.max_columns', None)
-    df.columns = pd.MultiIndex.from_tuples(tuples=columns)
+    start_times = (
+        sets.drop_duplicates("workout")["start_time"]
+        .dt.strftime("%Y-%m-%d %H:%M")
+        .to_numpy()
+    )
+    workout_level, set_level, kind_level = (wide.columns.get_level_values(i).to_numpy() for i in range(3))
+    df.columns = pd.MultiIndex.from_arrays([
+        start_times[workout_level],
+        np.where(kind_level == 0, "W ", "R ").astype(object) + set_level.astype(str).astype(object)
+    ])
     return df
 
 
@@ -241,173 +249,386 @@ def style_df(df):
     return styler
 
 
-def get_workout_df_by_exercise(workouts):
-    exercises = exercises_of_workouts(workouts)
-    return get_workout_df_for_routine(exercises, workouts)
-
-
-def get_workouts_by_routine_dfs(uuids) -> dict:
-    if not uuids:
-        return {}
-    workouts = get_workouts_with_details(uuids)
-    grouped_workouts = group_and_sort_workouts(workouts)
-    guessed_order = guess_order_of_workout_days(grouped_workouts)
-    group_exercises = exercises_of_group(grouped_workouts)
-
+def _workout_dfs_by_day(sets: pd.DataFrame, categorized_routines: set[str] | None = None) -> dict:
     return {
-        g: style_df(get_workout_df_for_routine(group_exercises[g], grouped_workouts[g]))
-        for g in guessed_order
+        g: workout_sets_pivot(group_sets)
+        for g, group_sets in group_workout_sets(sets, categorized_routines).items()
     }
 
 
-def get_workout_dfs_for_periodiq_plan(periodiq_plan_id: int) -> dict:
-    periodiq_plan = get_periodiq_plan(periodiq_plan_id)
-    if periodiq_plan is None:
+def _style_dfs(dfs: dict) -> dict:
+    # Stylers are built outside the cache, which only hands out copies of frames
+    return {g: style_df(df) for g, df in dfs.items()}
+
+
+@cached
+def _workout_dfs_by_routine(uuids) -> dict:
+    if not uuids:
         return {}
+    return _workout_dfs_by_day(get_workout_sets_df(uuids))
+
 
-    workouts = get_workouts_in_time_range(periodiq_plan.start_date, periodiq_plan.end_date)
+@timed
+def get_workouts_by_routine_dfs(uuids) -> dict:
+    return _style_dfs(_workout_dfs_by_routine(uuids))
 
-    hevy_routines = get_routines(routine_ids={x.routine_uuid for x in periodiq_plan.routines})
 
-    categorized_routines = set()
-    for routine in hevy_routines:
-        categorized_routines.add(routine.title)
+def _plan_sets_stmt(periodiq_plan_id: int) -> Select:
+    """
+    Sets of all workouts within the dates of a plan, flagged `categorized`
+    if the workout title is the title of one of the plan's routines.
+    """
+    plan_routine_titles = (
+        select(Routine.title)
+        .join(PeriodiqPlanRoutine, PeriodiqPlanRoutine.routine_uuid == Routine.uuid)
+        .where(PeriodiqPlanRoutine.periodiq_plan_id == periodiq_plan_id)
+    )
+    return (
+        _workout_sets_stmt(PeriodiqPlan.id == periodiq_plan_id)
+        .add_columns(Workout.title.in_(plan_routine_titles).label("categorized"))
+        .join(
+            PeriodiqPlan,
+            and_(
+                Workout.start_time >= PeriodiqPlan.start_date,
+                Workout.start_time <= PeriodiqPlan.end_date
+            )
+        )
+    )
 
-    grouped_workouts = group_and_sort_workouts(workouts, categorized_routines=categorized_routines)
-    guessed_order = guess_order_of_workout_days(grouped_workouts)
-    group_exercises = exercises_of_group(grouped_workouts)
 
-    return {
-        g: style_df(get_workout_df_for_routine(group_exercises[g], grouped_workouts[g]))
-        for g in guessed_order
-    }
+@cached
+def _workout_dfs_for_periodiq_plan(periodiq_plan_id: int) -> dict:
+    sets = _select_df(_plan_sets_stmt(periodiq_plan_id))
+    categorized_routines = set(sets.loc[sets["categorized"].astype(bool), "workout_title"])
+    return _workout_dfs_by_day(sets, categorized_routines)
 
 
-def get_workouts_by_exercise_df(uuids):
-    if not uuids:
-        return None
-    workouts = get_workouts_with_details(uuids)
-    return get_workout_df_by_exercise(workouts)
+@timed
+def get_workout_dfs_for_periodiq_plan(periodiq_plan_id: int) -> dict:
+    return _style_dfs(_workout_dfs_for_periodiq_plan(periodiq_plan_id))
 
 
-def exercise_name_df(uuids):
-    workouts = get_workouts_with_details(uuids)
-    exercises = exercises_of_workouts(workouts)
-    return pd.DataFrame({"Exercise": sorted(exercises)})
+# ----- exercises tab -----
 
+def _in_time_range(start_date: date, end_date: date):
+    return and_(Workout.start_time >= start_date, Workout.start_time <= end_date)
 
-def _get_one_rep_max_last(exercise: str, start_date: date, end_date: date):
-    with SessionLocal() as session:
-        # Epley 1RM formula
-        one_rm_expr = WorkoutSet.weight_kg * (
-                1 + (WorkoutSet.reps / 30)
-        )
 
-        stmt = (
-            select(func.max(one_rm_expr))
-            .select_from(WorkoutSet)
-            .join(WorkoutExercise)
-            .join(Workout)
-            .where(
-                WorkoutExercise.title == exercise,
-                WorkoutSet.reps != None,
-                WorkoutSet.reps > 0,
-                WorkoutSet.weight_kg != None,
-                Workout.start_time >= start_date,
-                Workout.start_time <= end_date
+@timed
+@cached
+def get_exercise_names_df(start_date: date, end_date: date) -> pd.DataFrame:
+    """Ids and titles of the exercises done between start_date and end_date, by title."""
+    stmt = (
+        select(Exercise.id.label("exercise_id"), Exercise.title.label("Exercise"))
+        .where(
+            Exercise.id.in_(
+                select(WorkoutExercise.exercise_id)
+                .join(Workout, Workout.id == WorkoutExercise.workout_id)
+                .where(_in_time_range(start_date, end_date))
             )
         )
+        .order_by(Exercise.title, Exercise.id)
+    )
+    return _select_df(stmt)
+
+
+@timed
+@cached
+def get_workouts_by_exercise_df(exercise_ids: list[int], start_date: date, end_date: date) -> pd.DataFrame:
+    """Set table of the given exercises only, for workouts between start_date and end_date."""
+    stmt = _workout_sets_stmt(
+        _in_time_range(start_date, end_date),
+        WorkoutExercise.exercise_id.in_(exercise_ids)
+    )
+    return workout_sets_pivot(_select_df(stmt), exercise_ids)
 
-        return session.execute(stmt).scalar()
 
+# ----- dashboard -----
 
-def _get_heaviest_weight_last(exercise: str, start_date: date, end_date: date):
+def get_exercises(template_ids: list[str]) -> pd.DataFrame:
+    """
+    Exercise ids and display labels of exercise templates, like the
+    Dashboard's priority exercises, indexed by template id in the given
+    order. Labels are the current titles, with the template id added where
+    two templates share a title. Templates never seen have no exercise id
+    and their template id as label.
+    """
     with SessionLocal() as session:
-        stmt = (
-            select(func.max(WorkoutSet.weight_kg))
-            .select_from(WorkoutSet)
-            .join(WorkoutExercise)
-            .join(Workout)
-            .where(
-                WorkoutExercise.title == exercise,
-                WorkoutSet.reps != None,
-                WorkoutSet.reps > 0,
-                WorkoutSet.weight_kg != None,
-                Workout.start_time >= start_date,
-                Workout.start_time <= end_date
+        stmt = select(Exercise.template_id, Exercise.id, Exercise.title).where(Exercise.template_id.in_(template_ids))
+        found = {template_id: (exercise_id, title) for template_id, exercise_id, title in session.execute(stmt)}
+
+    exercises = pd.DataFrame(
+        [(template_id, *found.get(template_id, (None, template_id))) for template_id in template_ids],
+        columns=["template_id", "exercise_id", "label"]
+    ).set_index("template_id")
+    exercises["exercise_id"] = exercises["exercise_id"].astype("Int64")
+    repeated = exercises["label"].duplicated(keep=False)
+    exercises.loc[repeated, "label"] += " (" + exercises.index[repeated] + ")"
+    return exercises
+
+
+@timed
+@cached
+def resolve_template_ids(exercises: list[tuple[str | None, str]]) -> list[str]:
+    """
+    Template ids of (template id, title) pairs, in the given order. Pairs
+    without a template id are looked up by the exercise's current title,
+    the first exercise seen wins where templates share it, and pairs whose
+    title no exercise has yet are left out.
+    """
+    titles = [title for template_id, title in exercises if template_id is None]
+    found = {}
+    if titles:
+        with SessionLocal() as session:
+            stmt = (
+                select(Exercise.title, Exercise.template_id)
+                .where(Exercise.title.in_(titles))
+                .order_by(Exercise.id)
             )
+            for title, template_id in session.execute(stmt):
+                found.setdefault(title, template_id)
+    return [template_id or found[title] for template_id, title in exercises if template_id or title in found]
+
+
+def dashboard_windows(today: date) -> dict[str, tuple[date, date]]:
+    """The windows compared on the Dashboard: last 3 months up to today and the 3 months before."""
+    prev_three = today - timedelta(90)
+    prev_six = today - timedelta(180)
+    return {
+        "last_three_months": (prev_three, today + timedelta(days=1)),
+        "prev_three_months": (prev_six, prev_three),
+    }
+
+
+def _exercise_metrics_stmt(exercise_ids: list[int], windows: dict[str, tuple[date, date]]) -> Select:
+    summary = ExerciseDailySummary
+    columns = []
+    for i, (start_date, end_date) in enumerate(windows.values()):
+        in_window = and_(summary.day >= start_date, summary.day < end_date)
+        columns.append(func.max(case((in_window, summary.best_one_rep_max))).label(f"one_rep_max_{i}"))
+        columns.append(func.max(case((in_window, summary.max_weight_kg))).label(f"heaviest_weight_{i}"))
+
+    return (
+        select(summary.exercise_id, *columns)
+        .where(
+            summary.exercise_id.in_(exercise_ids),
+            summary.day >= min(start for start, _ in windows.values()),
+            summary.day < max(end for _, end in windows.values())
         )
+        .group_by(summary.exercise_id)
+    )
 
-        return session.execute(stmt).scalar()
+
+def get_exercise_metrics(exercise_ids: list[int], windows: dict[str, tuple[date, date]]) -> pd.DataFrame:
+    """
+    Best 1RM (Epley) and heaviest weight in kg for every exercise and window
+    of days [start, end), computed in one grouped query over the daily
+    summary with one conditional aggregate per window.
+    Returns a tidy frame with columns exercise_id, window, one_rep_max and
+    heaviest_weight, with NaN where an exercise has no sets in a window.
+    """
+    with SessionLocal() as session:
+        rows = {r[0]: r[1:] for r in session.execute(_exercise_metrics_stmt(exercise_ids, windows))}
+
+    records = []
+    for exercise_id in exercise_ids:
+        values = rows.get(exercise_id, (None,) * 2 * len(windows))
+        for i, window in enumerate(windows):
+            records.append({
+                "exercise_id": exercise_id,
+                "window": window,
+                "one_rep_max": values[2 * i],
+                "heaviest_weight": values[2 * i + 1],
+            })
+    return pd.DataFrame(records, columns=["exercise_id", "window", "one_rep_max", "heaviest_weight"]).astype(
+        {"one_rep_max": "float64", "heaviest_weight": "float64"}
+    )
 
 
-def change_in_one_rep_max(exercise) -> tuple:
-    today = date.today() + timedelta(days=1)
-    prev_three = date.today() - timedelta(90)
-    prev_six = date.today() - timedelta(180)
-    last_three_months = int(_get_one_rep_max_last(exercise, prev_three, today) * KG_TO_LBS)
-    prev_three_months = int(_get_one_rep_max_last(exercise, prev_six, prev_three) * KG_TO_LBS)
-    return last_three_months, last_three_months - prev_three_months
+def _lbs(value) -> int | None:
+    return None if pd.isna(value) else int(value * KG_TO_LBS)
 
 
-def change_in_heaviest_weight(exercise) -> tuple:
-    today = date.today() + timedelta(days=1)
-    prev_three = date.today() - timedelta(90)
-    prev_six = date.today() - timedelta(180)
-    last_three_months = int(_get_heaviest_weight_last(exercise, prev_three, today) * KG_TO_LBS)
-    prev_three_months = int(_get_heaviest_weight_last(exercise, prev_six, prev_three) * KG_TO_LBS)
-    return last_three_months, last_three_months - prev_three_months
+@timed
+@cached
+def get_dashboard_metrics(template_ids: list[str], today: date) -> pd.DataFrame:
+    """
+    One row per exercise template with the best 1RM and heaviest weight in
+    lbs over the 3 months up to today and their change to the 3 months
+    before, as shown by the Dashboard metric cards. Rows are labelled like
+    get_exercises. today is an argument so cached results don't outlive
+    the day.
+    """
+    exercises = get_exercises(template_ids)
+    exercise_ids = exercises["exercise_id"].dropna().tolist()
+    metrics = (
+        get_exercise_metrics(exercise_ids, dashboard_windows(today))
+        .set_index(["exercise_id", "window"])
+    )
+
+    rows = []
+    for exercise_id, label in zip(exercises["exercise_id"], exercises["label"]):
+        row = {"exercise": label}
+        for metric in ("one_rep_max", "heaviest_weight"):
+            value = prev_value = None
+            if not pd.isna(exercise_id):
+                value = _lbs(metrics.at[(exercise_id, "last_three_months"), metric])
+                prev_value = _lbs(metrics.at[(exercise_id, "prev_three_months"), metric])
+            row[metric] = value
+            row[f"{metric}_change"] = None if value is None or prev_value is None else value - prev_value
+        rows.append(row)
+    return pd.DataFrame(rows, columns=[
+        "exercise", "one_rep_max", "one_rep_max_change", "heaviest_weight", "heaviest_weight_change"
+    ], dtype=object).set_index("exercise")
+
+
+def _week_start(day):
+    # Custom SQLite expression to get ISO week start (Monday)
+    return func.date(
+        day,
+        'weekday 0',  # move to Sunday
+        '-6 days'  # then go back to Monday
+    ).label("week_start")
+
+
+def _weekly_set_counts_stmt(start_date: date, end_date: date) -> Select:
+    week_start_expr = _week_start(ExerciseDailySummary.day)
+
+    return (
+        select(
+            week_start_expr,
+            func.sum(ExerciseDailySummary.set_count).label("set_count")
+        )
+        .where(
+            ExerciseDailySummary.day >= start_date,
+            ExerciseDailySummary.day < end_date
+        )
+        .group_by(week_start_expr)
+        .order_by(week_start_expr)
+    )
 
 
 def get_weekly_set_counts(start_date: date, end_date: date) -> list[tuple[int, int, int]]:
     """
-    Returns a list of (year, week, set_count) tuples for all workouts
-    with start_time >= start_date.
+    Returns a list of (week_start, set_count) tuples for all workouts
+    on days in [start_date, end_date).
     """
     with SessionLocal() as session:
-        # Custom SQLite expression to get ISO week start (Monday)
-        week_start_expr = func.date(
-            Workout.start_time,
-            'weekday 0',  # move to Sunday
-            '-6 days'  # then go back to Monday
-        ).label("week_start")
+        return session.execute(_weekly_set_counts_stmt(start_date, end_date)).all()
 
-        stmt = (
-            select(
-                week_start_expr,
-                func.count(WorkoutSet.id).label("set_count")
-            )
-            .select_from(WorkoutSet)
-            .join(WorkoutExercise)
-            .join(Workout)
-            .where(
-                Workout.start_time >= start_date,
-                Workout.start_time <= end_date
-            )
-            .group_by(week_start_expr)
-            .order_by(week_start_expr)
+
+def _weekly_muscle_group_stmt(
+    start_date: date,
+    end_date: date,
+    primary_weight: float,
+    secondary_weight: float
+) -> Select:
+    # the daily summary already counts sets per exercise and day, the
+    # muscle group join multiplies those rows instead of every set
+    summary = ExerciseDailySummary
+    muscle = ExerciseTemplateMuscleGroup
+    week_start_expr = _week_start(summary.day)
+    weight = case((muscle.is_primary, primary_weight), else_=secondary_weight)
+
+    return (
+        select(
+            week_start_expr,
+            muscle.muscle_group,
+            func.sum(weight * summary.set_count).label("sets"),
+            func.sum(weight * func.coalesce(summary.volume_kg, 0)).label("volume_kg")
+        )
+        .join(muscle, muscle.exercise_id == summary.exercise_id)
+        .where(
+            summary.day >= start_date,
+            summary.day < end_date
         )
+        .group_by(week_start_expr, muscle.muscle_group)
+        .order_by(week_start_expr, muscle.muscle_group)
+    )
 
-        return session.execute(stmt).all()
 
+@timed
+@cached
+def get_weekly_muscle_group_volume(
+    start_date: date,
+    end_date: date,
+    primary_weight: float = 1.0,
+    secondary_weight: float = 0.5
+) -> pd.DataFrame:
+    """
+    Sets and volume (weight_kg * reps) per ISO week and muscle group for
+    workouts on days in [start_date, end_date), in one grouped query. A set
+    counts primary_weight times for the primary muscle group of its
+    exercise template and secondary_weight times for each secondary one.
+    Exercises without a synced template are left out.
+    """
+    return _select_df(_weekly_muscle_group_stmt(start_date, end_date, primary_weight, secondary_weight))
 
-def get_weekly_sets_last_three_months():
-    today = date.today()
-    prev_three = date.today() - timedelta(90)
+
+@timed
+@cached
+def get_weekly_sets_last_three_months(today: date):
+    prev_three = today - timedelta(90)
     sets = get_weekly_set_counts(prev_three, today)
     return pd.DataFrame(sets)
 
 
+@timed
+@cached
+def get_e1rm_history(template_ids: list[str], formula: str = "epley") -> pd.DataFrame:
+    """
+    Best e1RM per workout and running all-time best in lbs, over all
+    recorded workouts of the exercise templates, labelled like
+    get_exercises. See src/e1rm.py.
+    """
+    history = e1rm.session_best(_load_sets(get_exercises(template_ids)), formula)
+    history[["e1rm", "best_e1rm"]] *= KG_TO_LBS
+    return history
+
+
+@timed
+@cached
+def get_rep_max_table(template_ids: list[str], implied: bool = False) -> pd.DataFrame:
+    """
+    Heaviest weight in lbs for 1 to 12 reps, one row per exercise template
+    labelled like get_exercises. With implied=True a cell is at least the
+    weight done for more reps, see e1rm.estimated_rep_max_table.
+    """
+    exercises = get_exercises(template_ids)
+    table = e1rm.rep_max_table(_load_sets(exercises))
+    if implied:
+        table = e1rm.estimated_rep_max_table(table)
+    table *= KG_TO_LBS
+    return table.reindex(pd.Index(exercises["label"], name="exercise")).round().astype("Int64")
+
+
+def _load_sets(exercises: pd.DataFrame) -> e1rm.SetArrays:
+    known = exercises.dropna(subset="exercise_id")
+    exercise_ids = known["exercise_id"].tolist()
+    return e1rm.load_sets(exercise_ids, labels=dict(zip(exercise_ids, known["label"])))
+
+
+@timed
+@cached
 def get_routines_df():
-    routines = get_routines_dict()
-    return pd.DataFrame(routines)
+    return _select_df(select(Routine.__table__).order_by(Routine.created_at.desc()))
 
 
+@timed
+@cached
 def get_periodiq_plans_df():
-    plans = get_periodiq_plans(True)
-    for plan in plans:
-        plan['routines'] = [r['routine_uuid'] for r in plan.get('routines', [])]
-    return pd.DataFrame(plans)
+    stmt = (
+        select(PeriodiqPlan.__table__, PeriodiqPlanRoutine.routine_uuid)
+        .outerjoin(PeriodiqPlanRoutine, PeriodiqPlanRoutine.periodiq_plan_id == PeriodiqPlan.id)
+        .order_by(PeriodiqPlan.start_date.desc(), PeriodiqPlanRoutine.id)
+    )
+    rows = _select_df(stmt)
+
+    # one row per plan, with the list of its routine uuids
+    routines = rows.groupby("id", sort=False)["routine_uuid"].agg(lambda uuids: list(uuids.dropna()))
+    plans = rows.drop(columns="routine_uuid").drop_duplicates("id").reset_index(drop=True)
+    plans["routines"] = plans["id"].map(routines)
+    return plans
 
 
 def verify_new_periodiq_plan(
@@ -445,6 +666,7 @@ def verify_new_periodiq_plan(
     return name, description, start_date, end_date, routine_uuids
 
 
+@timed
 def create_or_update_periodiq_plan(
     periodiq_plan_id: int | None,
     name: str,
@@ -478,10 +700,13 @@ def create_or_update_periodiq_plan(
             for uuid in list(dict.fromkeys(routine_uuids))
         ]
         session.add(plan)
+    bump_data_version()
 
 
+@timed
 def delete_periodiq_plan_by_id(periodiq_plan_id: int | None):
     with SessionLocal() as session, session.begin():
         plan_to_delete = session.get(PeriodiqPlan, periodiq_plan_id)
         if plan_to_delete:
             session.delete(plan_to_delete)
+    bump_data_version()
@@ -1,20 +1,85 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import threading
 
-from src.config import ROOT_DIR
+from sqlalchemy import Engine, create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+
+from src.config import CONFIG, ROOT_DIR, flag
+from src.instrumentation import instrument_engine
+
+# PRAGMAs applied to every new SQLite connection. WAL lets the app read
+# while the updater writes, synchronous=NORMAL is durable in WAL mode except
+# for the last transactions on power loss.
+SQLITE_PROFILES = {
+    "performance": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,  # negative values are KiB
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+        "foreign_keys": "ON",
+    },
+    "safe": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+        "foreign_keys": "ON",
+    },
+}
+
+# The engine is created on first use, not at import
+_engine: Engine | None = None
+_engine_lock = threading.Lock()
+
+
+def sqlite_pragmas() -> dict[str, str | int]:
+    return SQLITE_PROFILES[CONFIG.get("PERIODIQ_SQLITE_PROFILE") or "performance"]
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in sqlite_pragmas().items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
 
-engine = create_engine(
-    f"sqlite:///{ROOT_DIR}/periodiq.db",
-    echo=True,
-    connect_args={"check_same_thread": False}
-)
 
-# Make sure foreign-key enforcement is on (SQLite only)
-with engine.connect() as conn:
-    conn.exec_driver_sql("PRAGMA foreign_keys = ON")
+def get_engine() -> Engine:
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            engine = create_engine(
+                f"sqlite:///{ROOT_DIR}/periodiq.db",
+                # logs every statement, for debugging only
+                echo=flag(CONFIG.get("PERIODIQ_SQL_ECHO")),
+                connect_args={"check_same_thread": False}
+            )
+            event.listen(engine, "connect", _apply_sqlite_pragmas)
+            instrument_engine(engine)
+            _engine = engine
+        return _engine
 
-SessionLocal: sessionmaker = sessionmaker(
-    bind=engine,
+
+class _LazySessionmaker:
+    """sessionmaker bound to get_engine(), which is only called for the first session."""
+
+    def __init__(self, **kwargs):
+        self._kwargs = kwargs
+        self._factory: sessionmaker | None = None
+
+    def __call__(self, **kwargs) -> Session:
+        if self._factory is None:
+            self._factory = sessionmaker(bind=get_engine(), **self._kwargs)
+        return self._factory(**kwargs)
+
+
+SessionLocal = _LazySessionmaker(
     autoflush=False,
     expire_on_commit=False
 )
+
+
+def __getattr__(name: str):
+    # `from src.db.connection import engine` keeps working, creating the engine
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,255 @@
+"""
+Versioned schema migrations, run with `python migrate.py`.
+
+The schema version is kept in SQLite's PRAGMA user_version. Every migration
+is written to be idempotent (tables and indexes are created with checkfirst,
+columns are only added if missing), so databases created by the old
+import-time create_all start at version 0 and upgrade cleanly.
+"""
+import logging
+from typing import Callable
+
+from sqlalchemy import Connection, Engine, Column, Table, MetaData, Index, String, Date, Integer, Float, Boolean, \
+    inspect, select, func, true
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from src.db.connection import get_engine
+from src.db.models import Workout, WorkoutExercise, WorkoutSet, ExerciseTemplate, Routine, \
+    RoutineExercise, RoutineSet, PeriodiqPlan, PeriodiqPlanRoutine, SyncState, ExerciseDailySummary, \
+    ExerciseTemplateMuscleGroup, Exercise
+from src.db.muscle_groups import refresh_exercise_template_muscle_groups
+from src.db.summary import rebuild_exercise_daily_summary
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+class SchemaVersionError(RuntimeError):
+    ...
+
+
+# ----- helpers -----
+
+def _create_tables(conn: Connection, *models) -> None:
+    for model in models:
+        model.__table__.create(conn, checkfirst=True)
+
+
+def _columns(conn: Connection, table: Table) -> set[str]:
+    return {c["name"] for c in inspect(conn).get_columns(table.name)}
+
+
+def _create_indexes(conn: Connection, *models) -> None:
+    for model in models:
+        existing = _columns(conn, model.__table__)
+        for index in model.__table__.indexes:
+            # indexes on columns added later are created by that migration
+            if all(c.name in existing for c in index.columns):
+                index.create(conn, checkfirst=True)
+
+
+def _add_column(conn: Connection, table: Table, column: Column) -> bool:
+    """ALTER TABLE ... ADD COLUMN unless the column exists. Returns True if added."""
+    if column.name in _columns(conn, table):
+        return False
+    column_type = column.type.compile(dialect=conn.dialect)
+    conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}')
+    return True
+
+
+def backfill(conn: Connection, table: Table, set_sql: str, where_sql: str, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """
+    Runs `UPDATE table SET set_sql WHERE where_sql` in batches of batch_size
+    rows, committing after every batch so readers are never blocked for
+    long. where_sql must stop matching a row once it is updated.
+    Returns the number of updated rows.
+    """
+    total = 0
+    while True:
+        result = conn.exec_driver_sql(
+            f"UPDATE {table.name} SET {set_sql} WHERE rowid IN "
+            f"(SELECT rowid FROM {table.name} WHERE {where_sql} LIMIT {int(batch_size)})"
+        )
+        conn.commit()
+        total += result.rowcount
+        if result.rowcount < batch_size:
+            return total
+
+
+# ----- shipped table shapes -----
+# Tables as a migration created them before a later migration re-keyed
+# them, so the earlier migrations keep doing what they shipped with.
+
+_shipped = MetaData()
+
+# version 5 to 6, re-keyed on exercise_id by _0007_exercise_ids
+_EXERCISE_DAILY_SUMMARY_V5 = Table(
+    "exercise_daily_summary", _shipped,
+    Column("title", String, primary_key=True),
+    Column("day", Date, primary_key=True),
+    Column("set_count", Integer, nullable=False),
+    Column("total_reps", Integer),
+    Column("volume_kg", Float),
+    Column("best_one_rep_max", Float),
+    Column("max_weight_kg", Float),
+    Index("ix_exercise_daily_summary_day", "day"),
+)
+
+# version 6, re-keyed on exercise_id by _0007_exercise_ids
+_EXERCISE_TEMPLATE_MUSCLE_GROUP_V6 = Table(
+    "exercise_template_muscle_group", _shipped,
+    Column("exercise_template_id", String, primary_key=True),
+    Column("muscle_group", String, primary_key=True),
+    Column("is_primary", Boolean, nullable=False),
+)
+
+
+# ----- migrations -----
+
+def _0001_initial(conn: Connection) -> None:
+    _create_tables(
+        conn, Workout, WorkoutExercise, WorkoutSet, ExerciseTemplate, Routine,
+        RoutineExercise, RoutineSet, PeriodiqPlan, PeriodiqPlanRoutine
+    )
+
+
+def _0002_upsert_keys(conn: Connection) -> None:
+    # Core deletes ran with foreign keys off before, leaving children of
+    # deleted workouts behind, and their indexes could repeat. Both would
+    # fail the unique indexes; the newest row of a repeated index is kept.
+    conn.exec_driver_sql("DELETE FROM workout_exercise WHERE workout_id NOT IN (SELECT id FROM workout)")
+    conn.exec_driver_sql(
+        "DELETE FROM workout_exercise WHERE id NOT IN "
+        "(SELECT max(id) FROM workout_exercise GROUP BY workout_id, \"index\")"
+    )
+    conn.exec_driver_sql(
+        "DELETE FROM workout_set WHERE workout_exercise_id NOT IN (SELECT id FROM workout_exercise)"
+    )
+    conn.exec_driver_sql(
+        "DELETE FROM workout_set WHERE id NOT IN "
+        "(SELECT max(id) FROM workout_set GROUP BY workout_exercise_id, \"index\")"
+    )
+    _create_indexes(conn, WorkoutExercise, WorkoutSet)
+
+
+def _0003_sync_state(conn: Connection) -> None:
+    _create_tables(conn, SyncState)
+
+
+def _0004_dashboard_indexes(conn: Connection) -> None:
+    _create_indexes(conn, Workout, WorkoutExercise, WorkoutSet, RoutineExercise, RoutineSet,
+                    PeriodiqPlan, PeriodiqPlanRoutine)
+
+
+def _0005_exercise_daily_summary(conn: Connection) -> None:
+    _EXERCISE_DAILY_SUMMARY_V5.create(conn, checkfirst=True)
+    conn.exec_driver_sql(
+        "INSERT INTO exercise_daily_summary "
+        "(title, day, set_count, total_reps, volume_kg, best_one_rep_max, max_weight_kg) "
+        "SELECT workout_exercise.title, date(workout.start_time), count(workout_set.id), sum(workout_set.reps), "
+        "sum(workout_set.weight_kg * workout_set.reps), "
+        "max(CASE WHEN workout_set.reps > 0 AND workout_set.weight_kg IS NOT NULL "
+        "THEN workout_set.weight_kg * (1 + workout_set.reps / 30.0) END), "
+        "max(CASE WHEN workout_set.reps > 0 AND workout_set.weight_kg IS NOT NULL "
+        "THEN workout_set.weight_kg END) "
+        "FROM workout_set "
+        "JOIN workout_exercise ON workout_exercise.id = workout_set.workout_exercise_id "
+        "JOIN workout ON workout.id = workout_exercise.workout_id "
+        "GROUP BY workout_exercise.title, date(workout.start_time)"
+    )
+
+
+def _0006_exercise_template_muscle_groups(conn: Connection) -> None:
+    _EXERCISE_TEMPLATE_MUSCLE_GROUP_V6.create(conn, checkfirst=True)
+    conn.exec_driver_sql(
+        "INSERT INTO exercise_template_muscle_group (exercise_template_id, muscle_group, is_primary) "
+        "SELECT uuid, primary_muscle_group, 1 FROM exercise_template WHERE primary_muscle_group IS NOT NULL "
+        "UNION "
+        "SELECT uuid, value, 0 FROM exercise_template, json_each(exercise_template.secondary_muscle_groups) "
+        "WHERE value != primary_muscle_group"
+    )
+
+
+def _0007_exercise_ids(conn: Connection) -> None:
+    _create_tables(conn, Exercise)
+    exercise = Exercise.__table__
+    workout_exercise = WorkoutExercise.__table__
+
+    # catalog titles first, templates only seen in workouts get their latest title
+    template = ExerciseTemplate.__table__
+    conn.execute(
+        sqlite_insert(exercise)
+        .from_select(["template_id", "title"], select(template.c.uuid, template.c.title).where(true()))
+        .on_conflict_do_nothing()
+    )
+    latest = select(func.max(workout_exercise.c.id)).group_by(workout_exercise.c.exercise_template_id)
+    conn.execute(
+        sqlite_insert(exercise)
+        .from_select(
+            ["template_id", "title"],
+            select(workout_exercise.c.exercise_template_id, workout_exercise.c.title)
+            .where(workout_exercise.c.id.in_(latest))
+        )
+        .on_conflict_do_nothing()
+    )
+    conn.commit()
+
+    _add_column(conn, workout_exercise, workout_exercise.c.exercise_id)
+    backfill(
+        conn, workout_exercise,
+        "exercise_id = (SELECT id FROM exercise WHERE exercise.template_id = workout_exercise.exercise_template_id)",
+        "exercise_id IS NULL"
+    )
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_workout_exercise_title_workout_id")
+    _create_indexes(conn, WorkoutExercise)
+
+    # both were keyed on the title or template uuid before, rebuilt on the new key
+    for model in (ExerciseDailySummary, ExerciseTemplateMuscleGroup):
+        model.__table__.drop(conn, checkfirst=True)
+    _create_tables(conn, ExerciseDailySummary, ExerciseTemplateMuscleGroup)
+    rebuild_exercise_daily_summary(conn)
+    refresh_exercise_template_muscle_groups(conn)
+
+
+# Append only, the position in this list is the schema version
+MIGRATIONS: list[Callable[[Connection], None]] = [
+    _0001_initial,
+    _0002_upsert_keys,
+    _0003_sync_state,
+    _0004_dashboard_indexes,
+    _0005_exercise_daily_summary,
+    _0006_exercise_template_muscle_groups,
+    _0007_exercise_ids,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(engine: Engine | None = None) -> int:
+    with (engine or get_engine()).connect() as conn:
+        return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def check_schema(engine: Engine | None = None) -> None:
+    """Raises SchemaVersionError unless the database is at SCHEMA_VERSION."""
+    version = get_schema_version(engine)
+    if version < SCHEMA_VERSION:
+        raise SchemaVersionError(
+            f"Database schema is at version {version}, expected {SCHEMA_VERSION}. Run `python migrate.py`."
+        )
+    if version > SCHEMA_VERSION:
+        raise SchemaVersionError(
+            f"Database schema version {version} is newer than this version of Periodiq ({SCHEMA_VERSION})."
+        )
+
+
+def migrate(engine: Engine | None = None) -> int:
+    """Applies all pending migrations in order. Returns the new schema version."""
+    engine = engine or get_engine()
+    version = get_schema_version(engine)
+    for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        logging.info(f"Migrating schema to version {target} ({migration.__name__}).")
+        with engine.connect() as conn:
+            migration(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {target}")
+            conn.commit()
+    return max(version, SCHEMA_VERSION)
@@ -1,10 +1,8 @@
 from datetime import datetime, date
 
-from sqlalchemy import ForeignKey, Boolean, JSON, func
+from sqlalchemy import ForeignKey, Boolean, JSON, Index, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship, DeclarativeBase
 
-from src.db.connection import engine
-
 
 class Base(DeclarativeBase):
     ...
@@ -12,6 +10,9 @@ class Base(DeclarativeBase):
 
 class Workout(Base):
     __tablename__ = 'workout'
+    __table_args__ = (
+        Index("ix_workout_start_time", "start_time"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     uuid: Mapped[str] = mapped_column(unique=True, index=True)
@@ -33,6 +34,12 @@ class Workout(Base):
 
 class WorkoutExercise(Base):
     __tablename__ = 'workout_exercise'
+    __table_args__ = (
+        # upsert key for incremental syncs, also serves joins on workout_id
+        Index("ix_workout_exercise_workout_id_index", "workout_id", "index", unique=True),
+        # analytics lookups by exercise
+        Index("ix_workout_exercise_exercise_id_workout_id", "exercise_id", "workout_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     workout_id: Mapped[int] = mapped_column(
@@ -43,6 +50,7 @@ class WorkoutExercise(Base):
     title: Mapped[str]
     notes: Mapped[str | None]
     exercise_template_id: Mapped[str]  # can be joined to ExerciseTemplate (not enforced)
+    exercise_id: Mapped[int | None]  # Exercise.id of exercise_template_id (not enforced)
     supersets_id: Mapped[int | None]
 
     workout: Mapped["Workout"] = relationship(
@@ -60,6 +68,12 @@ class WorkoutExercise(Base):
 
 class WorkoutSet(Base):
     __tablename__ = 'workout_set'
+    __table_args__ = (
+        # upsert key for incremental syncs, also serves joins on workout_exercise_id
+        Index("ix_workout_set_workout_exercise_id_index", "workout_exercise_id", "index", unique=True),
+        # covers the 1RM / heaviest weight aggregates without touching the table
+        Index("ix_workout_set_workout_exercise_id_weight_kg_reps", "workout_exercise_id", "weight_kg", "reps"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     workout_exercise_id: Mapped[int] = mapped_column(
@@ -98,6 +112,39 @@ class ExerciseTemplate(Base):
         return f"ExerciseTemplate(id={self.id!r}, title={self.title!r})"
 
 
+class Exercise(Base):
+    """
+    Integer id for every exercise_template_id seen in workouts or the
+    template catalog. Analytics join and group on the id, the title is the
+    current name for display.
+    """
+    __tablename__ = "exercise"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    template_id: Mapped[str] = mapped_column(unique=True)  # ExerciseTemplate.uuid
+    title: Mapped[str]  # catalog title if synced, else the title first seen in a workout
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return f"Exercise(id={self.id!r}, title={self.title!r})"
+
+
+class ExerciseTemplateMuscleGroup(Base):
+    """
+    One row per exercise template and muscle group it trains, the
+    normalized form of primary_muscle_group and secondary_muscle_groups.
+    Maintained on template sync, see src.db.muscle_groups.
+    """
+    __tablename__ = "exercise_template_muscle_group"
+
+    exercise_id: Mapped[int] = mapped_column(primary_key=True)  # Exercise.id of the template
+    muscle_group: Mapped[str] = mapped_column(primary_key=True)
+    is_primary: Mapped[bool] = mapped_column(Boolean)
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return (f"ExerciseTemplateMuscleGroup(exercise_id={self.exercise_id!r}, "
+                f"muscle_group={self.muscle_group!r})")
+
+
 class Routine(Base):
     __tablename__ = "routine"
 
@@ -119,6 +166,9 @@ class Routine(Base):
 
 class RoutineExercise(Base):
     __tablename__ = "routine_exercise"
+    __table_args__ = (
+        Index("ix_routine_exercise_routine_id", "routine_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     routine_id: Mapped[str] = mapped_column(
@@ -145,6 +195,9 @@ class RoutineExercise(Base):
 
 class RoutineSet(Base):
     __tablename__ = "routine_set"
+    __table_args__ = (
+        Index("ix_routine_set_routine_exercise_id", "routine_exercise_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     routine_exercise_id: Mapped[int] = mapped_column(
@@ -168,6 +221,9 @@ class RoutineSet(Base):
 
 class PeriodiqPlan(Base):
     __tablename__ = "periodiq_plan"
+    __table_args__ = (
+        Index("ix_periodiq_plan_start_date_end_date", "start_date", "end_date"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(unique=True)
@@ -184,6 +240,9 @@ class PeriodiqPlan(Base):
 
 class PeriodiqPlanRoutine(Base):
     __tablename__ = "periodiq_plan_routine"
+    __table_args__ = (
+        Index("ix_periodiq_plan_routine_periodiq_plan_id", "periodiq_plan_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     periodiq_plan_id: Mapped[int] = mapped_column(
@@ -195,4 +254,38 @@ class PeriodiqPlanRoutine(Base):
     periodiq_plan: Mapped["PeriodiqPlan"] = relationship(back_populates="routines")
 
 
-Base.metadata.create_all(engine)
+class SyncState(Base):
+    """Per-resource watermark of the Hevy sync, see src.hevy.updater."""
+    __tablename__ = "sync_state"
+
+    resource: Mapped[str] = mapped_column(primary_key=True)  # "workouts", "exercise_templates", ...
+    last_event_at: Mapped[datetime | None]  # newest event/updated_at applied
+    last_page: Mapped[int | None]  # pages done by an unfinished backfill, None once it completed
+    etag: Mapped[str | None]  # no longer written, catalogs are compared by catalog_hash
+    catalog_hash: Mapped[str | None]  # hash of the last catalog written
+    updated_at: Mapped[datetime] = mapped_column(default=func.now(), onupdate=func.now())
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return f"SyncState(resource={self.resource!r}, last_event_at={self.last_event_at!r})"
+
+
+class ExerciseDailySummary(Base):
+    """
+    Per exercise and day aggregates of workout_set, maintained by the updater
+    (see src.db.summary) so dashboard metrics don't re-aggregate raw sets.
+    """
+    __tablename__ = "exercise_daily_summary"
+    __table_args__ = (
+        Index("ix_exercise_daily_summary_day", "day"),
+    )
+
+    exercise_id: Mapped[int] = mapped_column(primary_key=True)  # WorkoutExercise.exercise_id
+    day: Mapped[date] = mapped_column(primary_key=True)  # date(Workout.start_time)
+    set_count: Mapped[int]  # all sets, like get_weekly_set_counts
+    total_reps: Mapped[int | None]
+    volume_kg: Mapped[float | None]  # sum of weight_kg * reps
+    best_one_rep_max: Mapped[float | None]  # Epley, sets with reps > 0 and a weight only
+    max_weight_kg: Mapped[float | None]  # sets with reps > 0 and a weight only
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return f"ExerciseDailySummary(exercise_id={self.exercise_id!r}, day={self.day!r})"
@@ -0,0 +1,47 @@
+from typing import Iterable
+
+from sqlalchemy import select, delete, insert, union, true, func, literal, Connection, Select
+from sqlalchemy.orm import Session
+
+from src.db.models import Exercise, ExerciseTemplate, ExerciseTemplateMuscleGroup
+
+_COLUMNS = ["exercise_id", "muscle_group", "is_primary"]
+
+
+def _muscle_groups_select(where) -> Select:
+    """Primary and secondary muscle groups of the matching templates, decoded by SQLite's json_each."""
+    secondary = func.json_each(ExerciseTemplate.secondary_muscle_groups).table_valued("value")
+    return union(
+        select(Exercise.id, ExerciseTemplate.primary_muscle_group, literal(True))
+        .join(Exercise, Exercise.template_id == ExerciseTemplate.uuid)
+        .where(where, ExerciseTemplate.primary_muscle_group != None),
+        # a muscle group listed as primary and secondary counts as primary
+        select(Exercise.id, secondary.c.value, literal(False))
+        .select_from(ExerciseTemplate)
+        .join(Exercise, Exercise.template_id == ExerciseTemplate.uuid)
+        .join(secondary, true())
+        .where(where, secondary.c.value != ExerciseTemplate.primary_muscle_group),
+    )
+
+
+def refresh_exercise_template_muscle_groups(
+    session: Session | Connection,
+    template_uuids: Iterable[str] | None = None
+) -> None:
+    """
+    Rewrites the muscle group rows of the given templates (all templates if
+    None) from exercise_template. Call it with every template written, after
+    the templates got their exercise ids.
+    """
+    table = ExerciseTemplateMuscleGroup.__table__
+    if template_uuids is None:
+        session.execute(delete(table))
+        where = true()
+    else:
+        template_uuids = list(template_uuids)
+        if not template_uuids:
+            return
+        exercise_ids = select(Exercise.id).where(Exercise.template_id.in_(template_uuids))
+        session.execute(delete(table).where(table.c.exercise_id.in_(exercise_ids)))
+        where = ExerciseTemplate.uuid.in_(template_uuids)
+    session.execute(insert(table).from_select(_COLUMNS, _muscle_groups_select(where)))
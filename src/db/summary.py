@@ -0,0 +1,78 @@
+from datetime import date, datetime, timedelta
+from typing import Iterable
+
+from sqlalchemy import select, func, delete, insert, case, and_, Connection, Select
+from sqlalchemy.orm import Session
+
+from src.db.models import Workout, WorkoutExercise, WorkoutSet, ExerciseDailySummary
+
+# Epley 1RM formula
+ONE_REP_MAX_EXPR = WorkoutSet.weight_kg * (1 + (WorkoutSet.reps / 30))
+
+_DAY_EXPR = func.date(Workout.start_time)
+_IS_WEIGHTED_SET = and_(WorkoutSet.reps != None, WorkoutSet.reps > 0, WorkoutSet.weight_kg != None)
+
+
+def _summary_select() -> Select:
+    return (
+        select(
+            WorkoutExercise.exercise_id,
+            _DAY_EXPR,
+            func.count(WorkoutSet.id),
+            func.sum(WorkoutSet.reps),
+            func.sum(WorkoutSet.weight_kg * WorkoutSet.reps),
+            func.max(case((_IS_WEIGHTED_SET, ONE_REP_MAX_EXPR))),
+            func.max(case((_IS_WEIGHTED_SET, WorkoutSet.weight_kg))),
+        )
+        .select_from(WorkoutSet)
+        .join(WorkoutExercise)
+        .join(Workout)
+        .group_by(WorkoutExercise.exercise_id, _DAY_EXPR)
+    )
+
+
+_SUMMARY_COLUMNS = [
+    "exercise_id", "day", "set_count", "total_reps", "volume_kg", "best_one_rep_max", "max_weight_kg"
+]
+
+
+def _day_ranges(days: Iterable[date]) -> list[tuple[date, date]]:
+    """Merges days into inclusive (first, last) ranges of consecutive days."""
+    ranges = []
+    for day in sorted(set(days)):
+        if ranges and day - ranges[-1][1] == timedelta(days=1):
+            ranges[-1] = (ranges[-1][0], day)
+        else:
+            ranges.append((day, day))
+    return ranges
+
+
+def workout_days(session: Session, workout_uuids: Iterable[str]) -> set[date]:
+    """Days (as stored in the summary) on which the given workouts took place."""
+    workout_uuids = list(workout_uuids)
+    if not workout_uuids:
+        return set()
+    stmt = select(_DAY_EXPR).where(Workout.uuid.in_(workout_uuids)).distinct()
+    return {date.fromisoformat(d) for d in session.execute(stmt).scalars()}
+
+
+def refresh_exercise_daily_summary(session: Session | Connection, days: Iterable[date]) -> None:
+    """
+    Recomputes the summary rows of the given days from workout_set. Call it
+    with the days of every workout that was inserted, changed or deleted,
+    for deletions with the days collected before deleting.
+    """
+    table = ExerciseDailySummary.__table__
+    for first, last in _day_ranges(days):
+        session.execute(delete(table).where(table.c.day >= first, table.c.day <= last))
+        stmt = _summary_select().where(
+            Workout.start_time >= datetime.combine(first, datetime.min.time()),
+            Workout.start_time < datetime.combine(last + timedelta(days=1), datetime.min.time()),
+        )
+        session.execute(insert(table).from_select(_SUMMARY_COLUMNS, stmt))
+
+
+def rebuild_exercise_daily_summary(session: Session | Connection) -> None:
+    table = ExerciseDailySummary.__table__
+    session.execute(delete(table))
+    session.execute(insert(table).from_select(_SUMMARY_COLUMNS, _summary_select()))
@@ -0,0 +1,200 @@
+"""
+Estimated one rep max (e1RM) and rep-max history of exercises.
+
+load_sets reads the weighted sets of the given exercise ids into NumPy
+arrays with one SELECT, all other functions work on those arrays without
+looping over sets or sessions in Python. Sessions are workouts, so two
+workouts on one day are two points of a progress curve.
+"""
+from datetime import date
+from typing import Callable, NamedTuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, func
+
+from src.db.connection import SessionLocal
+from src.db.models import Workout, WorkoutExercise, WorkoutSet, Exercise
+
+# Julian day of 1970-01-01, SQLite's julianday() is converted to epoch time
+_UNIX_EPOCH_JULIAN_DAY = 2440587.5
+_MS_PER_DAY = 86_400_000
+
+MAX_REP_MAX = 12
+
+
+def epley(weight: np.ndarray, reps: np.ndarray) -> np.ndarray:
+    # same formula as ONE_REP_MAX_EXPR in src/db/summary.py
+    return weight * (1 + reps / 30)
+
+
+def brzycki(weight: np.ndarray, reps: np.ndarray) -> np.ndarray:
+    # undefined from 37 reps on
+    with np.errstate(divide="ignore"):
+        return np.where(reps < 37, weight * 36 / (37 - reps), np.nan)
+
+
+def lombardi(weight: np.ndarray, reps: np.ndarray) -> np.ndarray:
+    return weight * reps ** 0.1
+
+
+FORMULAS: dict[str, Callable[[np.ndarray, np.ndarray], np.ndarray]] = {
+    "epley": epley,
+    "brzycki": brzycki,
+    "lombardi": lombardi,
+}
+
+
+class SetArrays(NamedTuple):
+    """
+    Weighted sets as parallel arrays, sorted by exercise id, start time and
+    workout. exercise holds indices into exercise_ids and exercises.
+    """
+    exercise_ids: np.ndarray  # int64, Exercise.id, sorted
+    exercises: np.ndarray  # titles or labels of exercise_ids, for display
+    exercise: np.ndarray  # int64
+    workout: np.ndarray  # int64, workout id
+    start_time: np.ndarray  # datetime64[ms]
+    weight_kg: np.ndarray  # float64
+    reps: np.ndarray  # int64
+
+    def __len__(self) -> int:
+        return len(self.workout)
+
+
+def _sets_stmt(exercise_ids: list[int], start_date: date | None, end_date: date | None):
+    where = [
+        WorkoutExercise.exercise_id.in_(exercise_ids),
+        WorkoutSet.weight_kg != None,
+        WorkoutSet.reps > 0,
+    ]
+    if start_date is not None:
+        where.append(Workout.start_time >= start_date)
+    if end_date is not None:
+        where.append(Workout.start_time < end_date)
+    return (
+        select(
+            WorkoutExercise.exercise_id,
+            Workout.id,
+            # a float per row instead of a parsed datetime object
+            func.julianday(Workout.start_time),
+            WorkoutSet.weight_kg,
+            WorkoutSet.reps,
+        )
+        .select_from(WorkoutSet)
+        .join(WorkoutExercise, WorkoutExercise.id == WorkoutSet.workout_exercise_id)
+        .join(Workout, Workout.id == WorkoutExercise.workout_id)
+        .where(*where)
+        .order_by(WorkoutExercise.exercise_id, Workout.start_time, Workout.id)
+    )
+
+
+def load_sets(
+    exercise_ids: list[int],
+    start_date: date | None = None,
+    end_date: date | None = None,
+    labels: dict[int, str] | None = None
+) -> SetArrays:
+    """
+    Weighted sets (reps > 0, weight set) of the exercises on days in
+    [start_date, end_date). Exercises are named by labels, by their current
+    titles if None.
+    """
+    with SessionLocal() as session:
+        rows = session.execute(_sets_stmt(exercise_ids, start_date, end_date)).all()
+        if labels is None:
+            stmt = select(Exercise.id, Exercise.title).where(Exercise.id.in_(exercise_ids))
+            labels = dict(session.execute(stmt).all())
+    return _set_arrays(rows, labels)
+
+
+def _set_arrays(rows, titles: dict[int, str]) -> SetArrays:
+    if not rows:
+        return SetArrays(
+            np.array([], dtype=np.int64), np.array([], dtype=object), np.array([], dtype=np.int64),
+            np.array([], dtype=np.int64), np.array([], dtype="datetime64[ms]"), np.array([], dtype=np.float64),
+            np.array([], dtype=np.int64)
+        )
+
+    ids, workouts, julian_days, weights, reps = zip(*rows)
+    # rows come sorted by exercise id, the runs of equal ids are the exercises
+    ids = np.array(ids, dtype=np.int64)
+    starts = _run_starts(ids)
+    exercise = np.zeros(len(ids), dtype=np.int64)
+    exercise[starts[1:]] = 1
+    exercise_ids = ids[starts]
+    epoch_ms = (np.array(julian_days, dtype=np.float64) - _UNIX_EPOCH_JULIAN_DAY) * _MS_PER_DAY
+    return SetArrays(
+        exercise_ids,
+        np.array([titles.get(i, str(i)) for i in exercise_ids.tolist()], dtype=object),
+        np.cumsum(exercise),
+        np.array(workouts, dtype=np.int64),
+        np.rint(epoch_ms).astype(np.int64).astype("datetime64[ms]"),
+        np.array(weights, dtype=np.float64),
+        np.array(reps, dtype=np.int64),
+    )
+
+
+def _run_starts(*keys: np.ndarray) -> np.ndarray:
+    """Start positions of the runs of equal consecutive values in keys."""
+    if len(keys[0]) == 0:
+        return np.array([], dtype=np.intp)
+    changed = np.zeros(len(keys[0]), dtype=bool)
+    changed[0] = True
+    for key in keys:
+        changed[1:] |= key[1:] != key[:-1]
+    return np.flatnonzero(changed)
+
+
+def session_best(sets: SetArrays, formula: str = "epley") -> pd.DataFrame:
+    """
+    Best e1RM of every exercise and workout with the running all-time best
+    up to and including that workout. Columns exercise, workout,
+    start_time, e1rm and best_e1rm, in exercise and start time order.
+    """
+    e1rm = FORMULAS[formula](sets.weight_kg, sets.reps)
+
+    # sets are sorted by exercise and workout, every run is one session
+    starts = _run_starts(sets.exercise, sets.workout)
+    session_e1rm = np.fmax.reduceat(e1rm, starts) if len(starts) else e1rm[:0]
+    session_exercise = sets.exercise[starts]
+
+    # the running best restarts with every exercise; the loop is over
+    # exercises, each accumulate covers all sessions of one exercise
+    best = np.empty_like(session_e1rm)
+    bounds = np.append(_run_starts(session_exercise), len(session_exercise))
+    for first, last in zip(bounds[:-1], bounds[1:]):
+        best[first:last] = np.fmax.accumulate(session_e1rm[first:last])
+
+    return pd.DataFrame({
+        "exercise": sets.exercises[session_exercise],
+        "workout": sets.workout[starts],
+        "start_time": sets.start_time[starts],
+        "e1rm": session_e1rm,
+        "best_e1rm": best,
+    })
+
+
+def rep_max_table(sets: SetArrays, max_reps: int = MAX_REP_MAX) -> pd.DataFrame:
+    """
+    Heaviest weight lifted for exactly 1 to max_reps reps, one row per
+    exercise and one column per rep count, NaN where never done.
+    """
+    table = np.full((len(sets.exercises), max_reps), np.nan)
+    in_range = sets.reps <= max_reps
+    np.fmax.at(table, (sets.exercise[in_range], sets.reps[in_range] - 1), sets.weight_kg[in_range])
+    return pd.DataFrame(
+        table,
+        index=pd.Index(sets.exercises, name="exercise"),
+        columns=pd.RangeIndex(1, max_reps + 1, name="reps")
+    )
+
+
+def estimated_rep_max_table(table: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rep-max table where every cell is at least the weight done for more
+    reps, as a set of 100 kg x 5 shows that 100 kg x 3 is possible.
+    """
+    values = table.to_numpy()
+    implied = np.fmax.accumulate(values[:, ::-1], axis=1)[:, ::-1]
+    return pd.DataFrame(implied, index=table.index, columns=table.columns)
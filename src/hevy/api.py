@@ -1,59 +1,287 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 from datetime import datetime
-import requests
-from requests import Response
+from email.utils import parsedate_to_datetime
+from itertools import islice
+from typing import Iterator, TYPE_CHECKING
 
-from src.config import CONFIG
+from src.config import setting
+from src.instrumentation import timed
+
+if TYPE_CHECKING:
+    import requests
+    from requests import Response
+
+# requests is imported on first use, so importing the client (e.g. through
+# the app's sync worker) doesn't load it before a sync actually runs.
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
 
 
 class HevyAPI:
-    BASE_URL = "https://api.hevyapp.com/v1"
-    API_KEY = CONFIG["HEVY_API_KEY"]
+    BASE_URL = setting("HEVY_BASE_URL", "https://api.hevyapp.com/v1")
+    API_KEY = setting("HEVY_API_KEY")
     _PAGE_SIZE = 10
 
+    # Retry policy for transient errors (429 and 5xx, connection errors)
+    MAX_RETRIES = setting("HEVY_MAX_RETRIES", 5, int)
+    BACKOFF_BASE = 0.5  # seconds, doubled on every attempt
+    BACKOFF_MAX = 30.0
+    # Retry-After is honoured in full; a longer wait than this gives up instead
+    RETRY_AFTER_MAX = setting("HEVY_RETRY_AFTER_MAX_SECONDS", 300.0, float)
+    TIMEOUT = 30
+
+    _session: "requests.Session | None" = None
+    _session_lock = threading.Lock()
+
+    # Counters, see stats() / reset_stats()
+    _stats_lock = threading.Lock()
+    _stats = {
+        "requests": 0,
+        "retries": 0,
+        "failures": 0,
+        "total_latency_s": 0.0,
+        "max_latency_s": 0.0,
+    }
+
+    # Largest pageSize the Hevy API accepts per endpoint
+    MAX_PAGE_SIZES = {
+        "workouts": 10,
+        "workouts/events": 10,
+        "routines": 10,
+        "exercise_templates": 100,
+    }
+
+    # Number of pages fetched in parallel after the first page
+    MAX_CONCURRENCY = setting("HEVY_MAX_CONCURRENCY", 4, int)
+
     @classmethod
-    def _paginate(cls, path: str, data_key: str, extra_params: dict[str, any] | None = None) -> list[dict]:
-        items: list[dict] = []
-        current_page = 1
+    def session(cls) -> "requests.Session":
+        """Shared keep-alive session, created on first use."""
+        import requests
+        from requests.adapters import HTTPAdapter
 
-        params = {"page": current_page, "pageSize": cls._PAGE_SIZE}
-        if extra_params:
-            params.update(extra_params)
-
-        def _get_page(page: int) -> Response:
-            params["page"] = page
-            response = requests.get(
-                f"{cls.BASE_URL}/{path}",
-                headers={"api-key": cls.API_KEY},
-                params=params
-            )
+        with cls._session_lock:
+            if cls._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    # room for the resources refresh_data syncs in parallel
+                    pool_maxsize=max(cls.MAX_CONCURRENCY, 1) * 3
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                cls._session = session
+            return cls._session
+
+    @classmethod
+    def set_session(cls, session: "requests.Session | None", base_url: str | None = None) -> None:
+        """
+        Replaces the shared session, e.g. to point the client at a local
+        stand-in server. Passing None makes the next request create a new one.
+        """
+        with cls._session_lock:
+            if cls._session is not None and cls._session is not session:
+                cls._session.close()
+            cls._session = session
+        if base_url is not None:
+            cls.BASE_URL = base_url
+
+    @classmethod
+    def stats(cls) -> dict[str, float]:
+        with cls._stats_lock:
+            return dict(cls._stats)
+
+    @classmethod
+    def reset_stats(cls) -> None:
+        with cls._stats_lock:
+            for key, value in cls._stats.items():
+                cls._stats[key] = type(value)()
+
+    @classmethod
+    def _record(cls, latency: float, retries: int, failed: bool) -> None:
+        with cls._stats_lock:
+            cls._stats["requests"] += 1
+            cls._stats["retries"] += retries
+            cls._stats["failures"] += int(failed)
+            cls._stats["total_latency_s"] += latency
+            cls._stats["max_latency_s"] = max(cls._stats["max_latency_s"], latency)
+
+    @classmethod
+    def _backoff(cls, attempt: int, response: "Response | None") -> float:
+        """
+        Seconds to wait before the next attempt. A Retry-After header is
+        honoured as is, even beyond BACKOFF_MAX, see RETRY_AFTER_MAX.
+        """
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return max(float(retry_after), 0.0)
+                except ValueError:
+                    try:
+                        delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                        return max(delay, 0.0)
+                    except (TypeError, ValueError):
+                        pass
+        # exponential backoff with full jitter
+        return random.uniform(0, min(cls.BACKOFF_BASE * 2 ** attempt, cls.BACKOFF_MAX))
+
+    @classmethod
+    @timed
+    def _get(
+        cls,
+        path: str,
+        params: dict[str, any] | None = None,
+        headers: dict[str, str] | None = None,
+        raise_for_status: bool = True
+    ) -> "Response":
+        """
+        GET on the shared session. Retries 429/5xx responses and connection
+        errors up to MAX_RETRIES times, or until the server asks to wait
+        longer than RETRY_AFTER_MAX, and raises for any other error status
+        unless raise_for_status=False.
+        """
+        import requests
+
+        url = f"{cls.BASE_URL}/{path}"
+        attempt = 0
+        start = time.perf_counter()
+
+        while True:
+            response = None
+            try:
+                response = cls.session().get(
+                    url,
+                    headers={"api-key": cls.API_KEY, **(headers or {})},
+                    params=params,
+                    timeout=cls.TIMEOUT
+                )
+                if response.status_code not in RETRY_STATUS_CODES:
+                    break
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= cls.MAX_RETRIES:
+                    cls._record(time.perf_counter() - start, attempt, failed=True)
+                    raise
+            if attempt >= cls.MAX_RETRIES:
+                break
+
+            delay = cls._backoff(attempt, response)
+            if response is not None and delay > cls.RETRY_AFTER_MAX:
+                logging.warning(f"GET {path}: server asks to retry in {delay:.0f}s, giving up.")
+                break
+            if response is not None:
+                # return the connection to the pool before waiting
+                response.close()
+            logging.info(f"Retrying GET {path} in {delay:.2f}s (attempt {attempt + 1}/{cls.MAX_RETRIES}).")
+            time.sleep(delay)
+            attempt += 1
+
+        cls._record(time.perf_counter() - start, attempt, failed=not response.ok)
+        if raise_for_status:
             response.raise_for_status()
-            return response
+        return response
+
+    @classmethod
+    def max_page_size(cls, path: str) -> int:
+        return cls.MAX_PAGE_SIZES.get(path, cls._PAGE_SIZE)
+
+    @classmethod
+    def _iter_pages(
+        cls,
+        path: str,
+        data_key: str,
+        extra_params: dict[str, any] | None = None,
+        concurrency: int | None = None,
+        reverse: bool = False,
+        first_page: dict | None = None
+    ) -> Iterator[list[dict]]:
+        """
+        Yields the items of a paginated endpoint page by page, in page order
+        (last page first if reverse=True). Page 1 is fetched on its own to
+        learn page_count unless its body is passed as first_page, after that
+        at most `concurrency` pages (defaults to MAX_CONCURRENCY, 1 fetches
+        serially) are in flight at any time, so only a bounded number of
+        pages is held in memory.
+        """
+        concurrency = concurrency or cls.MAX_CONCURRENCY
+
+        base_params = {"pageSize": cls.max_page_size(path)}
+        if extra_params:
+            base_params.update(extra_params)
+
+        def _get_page(page: int) -> "Response":
+            return cls._get(path, params={**base_params, "page": page})
 
         # fetch first page to get page_count
-        first_resp = _get_page(current_page)
-        data = first_resp.json()
+        data = first_page if first_page is not None else _get_page(1).json()
         page_count = data.get("page_count", 0)
-        items.extend(data.get(data_key, []) or [])
+        first_items = data.get(data_key, []) or []
+
+        def _page_items(page: int) -> list[dict]:
+            if page == 1:
+                return first_items
+            return _get_page(page).json().get(data_key, []) or []
+
+        remaining_pages = range(1, page_count + 1)
+        if reverse:
+            remaining_pages = remaining_pages[::-1]
 
-        # fetch remaining pages
-        while current_page < page_count:
-            current_page += 1
-            resp = _get_page(current_page)
-            items.extend(resp.json().get(data_key, []) or [])
+        if concurrency <= 1 or len(remaining_pages) <= 1:
+            for page in remaining_pages:
+                yield _page_items(page)
+        else:
+            pages = iter(remaining_pages)
+            with ThreadPoolExecutor(max_workers=min(concurrency, len(remaining_pages))) as pool:
+                # sliding window of in-flight pages, consumed in submission order
+                pending = deque(pool.submit(_page_items, p) for p in islice(pages, concurrency))
+                while pending:
+                    page_items = pending.popleft().result()
+                    next_page = next(pages, None)
+                    if next_page is not None:
+                        pending.append(pool.submit(_page_items, next_page))
+                    yield page_items
 
+    @classmethod
+    def _paginate(
+        cls,
+        path: str,
+        data_key: str,
+        extra_params: dict[str, any] | None = None,
+        concurrency: int | None = None
+    ) -> list[dict]:
+        items: list[dict] = []
+        for page_items in cls._iter_pages(path, data_key, extra_params, concurrency):
+            items.extend(page_items)
         return items
 
     @classmethod
-    def get_workouts_count(cls) -> Response:
-        return requests.get(
-            f"{cls.BASE_URL}/workouts/count",
-            headers={"api-key": cls.API_KEY},
-        )
+    def get_workouts_count(cls) -> "Response":
+        # the raw response, error statuses included, as callers check it themselves
+        return cls._get("workouts/count", raise_for_status=False)
 
     @classmethod
     def get_workouts(cls) -> list[dict]:
         return cls._paginate("workouts", "workouts")
 
+    @classmethod
+    def iter_workout_pages(cls, oldest_first: bool = False) -> Iterator[list[dict]]:
+        """
+        Streams workouts page by page. The API returns the most recent workouts
+        first, with oldest_first=True pages are walked backwards and each page
+        is reversed, so workouts arrive in chronological order.
+        """
+        pages = cls._iter_pages("workouts", "workouts", reverse=oldest_first)
+        if not oldest_first:
+            yield from pages
+            return
+        for page_items in pages:
+            yield page_items[::-1]
+
     @classmethod
     def get_workouts_events(cls, since: datetime) -> list[dict]:
         since_iso = since.isoformat(timespec='seconds')
@@ -0,0 +1,354 @@
+from datetime import datetime
+from typing import Callable, Iterable
+
+from sqlalchemy import select, func, insert, delete, true, Table
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from src.db.models import Workout, WorkoutExercise, WorkoutSet, Routine, RoutineExercise, RoutineSet, \
+    ExerciseTemplate, Exercise
+from src.db.muscle_groups import refresh_exercise_template_muscle_groups
+from src.hevy.utils import workout_row, workout_exercise_row, workout_set_row, routine_row, \
+    routine_exercise_row, routine_set_row, sort_workout_payloads, exercise_template_row
+
+
+def _next_id(session: Session, table: Table) -> int:
+    return (session.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+
+
+def _bulk_insert_tree(
+    session: Session,
+    payloads: list[dict],
+    tables: tuple[Table, Table, Table],
+    foreign_keys: tuple[str, str],
+    row_parsers: tuple[Callable[[dict], dict], Callable[[dict], dict], Callable[[dict], dict]],
+    parent_ids: list[int] | None = None,
+) -> int:
+    """
+    Inserts a parent -> exercises -> sets tree for every payload with one
+    executemany INSERT per table. Primary keys are pre-assigned from max(id) + 1
+    so children can reference their parents without a flush per level, which
+    requires the caller to be the only writer for the duration of its transaction.
+    If parent_ids are given, the parents already exist and only their
+    exercises and sets are inserted.
+    """
+    if not payloads:
+        return 0
+
+    parent_table, exercise_table, set_table = tables
+    exercise_fk, set_fk = foreign_keys
+    parse_parent, parse_exercise, parse_set = row_parsers
+
+    next_parent_id = _next_id(session, parent_table) if parent_ids is None else None
+    exercise_id = _next_id(session, exercise_table)
+    set_id = _next_id(session, set_table)
+
+    parent_rows, exercise_rows, set_rows = [], [], []
+    for i, payload in enumerate(payloads):
+        if parent_ids is None:
+            parent_id = next_parent_id + i
+            parent_rows.append({"id": parent_id, **parse_parent(payload)})
+        else:
+            parent_id = parent_ids[i]
+
+        for ex in payload.get("exercises", []):
+            exercise_rows.append({"id": exercise_id, exercise_fk: parent_id, **parse_exercise(ex)})
+
+            for st in ex.get("sets", []):
+                set_rows.append({"id": set_id, set_fk: exercise_id, **parse_set(st)})
+                set_id += 1
+
+            exercise_id += 1
+
+    if parent_rows:
+        session.execute(insert(parent_table), parent_rows)
+    if exercise_rows:
+        session.execute(insert(exercise_table), exercise_rows)
+    if set_rows:
+        session.execute(insert(set_table), set_rows)
+
+    return len(payloads)
+
+
+def intern_exercises(session: Session, exercises: Iterable[tuple[str, str]], update: bool = False) -> dict[str, int]:
+    """
+    Maps (exercise_template_id, title) pairs to Exercise ids, inserting
+    templates not seen before. Stored titles are only replaced if update is
+    set. Returns exercise_template_id -> Exercise.id.
+    """
+    table = Exercise.__table__
+    titles = dict(exercises)
+    rows = [{"template_id": template_id, "title": title} for template_id, title in titles.items()]
+    if not rows:
+        return {}
+    _upsert(session, table, rows, ("template_id",), update=update)
+    stmt = select(table.c.template_id, table.c.id).where(table.c.template_id.in_([r["template_id"] for r in rows]))
+    return dict(session.execute(stmt).all())
+
+
+def _workout_exercise_parser(session: Session, payloads: list[dict]) -> Callable[[dict], dict]:
+    """workout_exercise_row with the interned exercise_id of the exercise template."""
+    exercise_ids = intern_exercises(
+        session,
+        ((ex["exercise_template_id"], ex["title"]) for p in payloads for ex in p.get("exercises", []))
+    )
+    return lambda ex: {**workout_exercise_row(ex), "exercise_id": exercise_ids[ex["exercise_template_id"]]}
+
+
+def bulk_insert_workouts(session: Session, payloads: list[dict]) -> int:
+    """
+    Inserts workouts with their exercises and sets, in start_time order, with
+    one INSERT per table. Returns the number of workouts.
+    """
+    payloads = sort_workout_payloads(payloads)
+    return _bulk_insert_tree(
+        session,
+        payloads,
+        tables=(Workout.__table__, WorkoutExercise.__table__, WorkoutSet.__table__),
+        foreign_keys=("workout_id", "workout_exercise_id"),
+        row_parsers=(workout_row, _workout_exercise_parser(session, payloads), workout_set_row),
+    )
+
+
+def bulk_insert_routines(session: Session, payloads: list[dict]) -> int:
+    """Same as bulk_insert_workouts for routines, in the given order."""
+    return _bulk_insert_tree(
+        session,
+        payloads,
+        tables=(Routine.__table__, RoutineExercise.__table__, RoutineSet.__table__),
+        foreign_keys=("routine_id", "routine_exercise_id"),
+        row_parsers=(routine_row, routine_exercise_row, routine_set_row),
+    )
+
+
+def _normalize(row: dict) -> dict:
+    # SQLite stores datetimes without tzinfo, compare incoming values the same way
+    return {
+        k: v.replace(tzinfo=None) if isinstance(v, datetime) else v
+        for k, v in row.items()
+    }
+
+
+def _stored_rows(session: Session, table: Table, key_columns: tuple[str, ...], columns: Iterable[str], where) -> dict:
+    """Maps key tuple -> (id, {column: value}) for the stored rows matching `where`."""
+    columns = list(columns)
+    stmt = select(table.c.id, *[table.c[c] for c in columns]).where(where)
+    stored = {}
+    for row in session.execute(stmt):
+        values = dict(zip(columns, row[1:]))
+        stored[tuple(values[k] for k in key_columns)] = (row.id, values)
+    return stored
+
+
+def _upsert(
+    session: Session,
+    table: Table,
+    rows: list[dict],
+    key_columns: tuple[str, ...],
+    update: bool = True
+) -> int:
+    """
+    INSERT ... ON CONFLICT (key_columns) DO UPDATE for all rows in one
+    executemany, or DO NOTHING if update=False.
+    """
+    if not rows:
+        return 0
+    stmt = sqlite_insert(table)
+    if update:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={c: stmt.excluded[c] for c in rows[0] if c not in key_columns}
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=list(key_columns))
+    session.execute(stmt, rows)
+    return len(rows)
+
+
+def _sync_level(session: Session, table: Table, key_columns: tuple[str, ...], incoming: dict, where) -> tuple[dict, int, int]:
+    """
+    Upserts the incoming rows (key tuple -> row) that differ from what is
+    stored and deletes stored rows whose key is no longer present. Returns
+    (key tuple -> id, number of upserted rows, number of deleted rows).
+    """
+    columns = next(iter(incoming.values())).keys() if incoming else key_columns
+    stored = _stored_rows(session, table, key_columns, columns, where)
+
+    changed = [row for key, row in incoming.items() if key not in stored or stored[key][1] != row]
+    stale_ids = [row_id for key, (row_id, _) in stored.items() if key not in incoming]
+
+    if stale_ids:
+        session.execute(delete(table).where(table.c.id.in_(stale_ids)))
+    upserted = _upsert(session, table, changed, key_columns)
+
+    ids = {key: row_id for key, (row_id, _) in stored.items() if key in incoming}
+    if any(key not in ids for key in incoming):
+        # fetch the ids assigned to newly inserted rows
+        ids = {key: row_id for key, (row_id, _) in _stored_rows(session, table, key_columns, key_columns, where).items()}
+
+    return ids, upserted, len(stale_ids)
+
+
+def upsert_workouts(session: Session, payloads: list[dict]) -> dict[str, int]:
+    """
+    Applies updated workouts as a diff against the stored rows. Workouts are
+    matched on uuid, exercises on (workout_id, index) and sets on
+    (workout_exercise_id, index); only rows whose values changed are written
+    with INSERT ... ON CONFLICT DO UPDATE, and rows missing from the payload
+    are deleted. Unchanged rows keep their ids. Returns per-table counts.
+    """
+    counts = {"workouts": 0, "exercises": 0, "sets": 0, "deleted_exercises": 0, "deleted_sets": 0}
+    if not payloads:
+        return counts
+
+    workout_table = Workout.__table__
+    exercise_table = WorkoutExercise.__table__
+    set_table = WorkoutSet.__table__
+
+    payloads = sort_workout_payloads(payloads)
+
+    # ----- workouts -----
+    incoming_workouts = {(p["id"],): _normalize(workout_row(p)) for p in payloads}
+    workout_ids, counts["workouts"], _ = _sync_level(
+        session, workout_table, ("uuid",), incoming_workouts,
+        where=workout_table.c.uuid.in_([k[0] for k in incoming_workouts])
+    )
+    ids = list(workout_ids.values())
+
+    # ----- exercises -----
+    parse_exercise = _workout_exercise_parser(session, payloads)
+    incoming_exercises = {}
+    payload_exercises = {}
+    for p in payloads:
+        workout_id = workout_ids[(p["id"],)]
+        for ex in p.get("exercises", []):
+            key = (workout_id, ex["index"])
+            incoming_exercises[key] = {"workout_id": workout_id, **_normalize(parse_exercise(ex))}
+            payload_exercises[key] = ex
+
+    # sets of exercises that are about to be removed go first
+    stored_exercises = _stored_rows(
+        session, exercise_table, ("workout_id", "index"), ("workout_id", "index"),
+        where=exercise_table.c.workout_id.in_(ids)
+    )
+    stale_exercise_ids = [row_id for key, (row_id, _) in stored_exercises.items() if key not in incoming_exercises]
+    if stale_exercise_ids:
+        counts["deleted_sets"] += session.execute(
+            delete(set_table).where(set_table.c.workout_exercise_id.in_(stale_exercise_ids))
+        ).rowcount
+
+    exercise_ids, counts["exercises"], counts["deleted_exercises"] = _sync_level(
+        session, exercise_table, ("workout_id", "index"), incoming_exercises,
+        where=exercise_table.c.workout_id.in_(ids)
+    )
+
+    # ----- sets -----
+    incoming_sets = {}
+    for key, ex in payload_exercises.items():
+        exercise_id = exercise_ids[key]
+        for st in ex.get("sets", []):
+            incoming_sets[(exercise_id, st["index"])] = {
+                "workout_exercise_id": exercise_id, **_normalize(workout_set_row(st))
+            }
+
+    _, counts["sets"], deleted_sets = _sync_level(
+        session, set_table, ("workout_exercise_id", "index"), incoming_sets,
+        where=set_table.c.workout_exercise_id.in_(
+            select(exercise_table.c.id).where(exercise_table.c.workout_id.in_(ids))
+        )
+    )
+    counts["deleted_sets"] += deleted_sets
+
+    return counts
+
+
+def _diff_catalog(session: Session, table: Table, rows: list[dict]) -> tuple[list[dict], list[dict], dict]:
+    """
+    Splits catalog rows into (new, changed) against the stored catalog, keyed
+    on uuid. The whole table is read once rather than bound as a huge IN list.
+    """
+    stored = _stored_rows(session, table, ("uuid",), rows[0].keys(), where=true())
+    new = [r for r in rows if (r["uuid"],) not in stored]
+    changed = [r for r in rows if (r["uuid"],) in stored and stored[(r["uuid"],)][1] != r]
+    return new, changed, stored
+
+
+def sync_exercise_templates(session: Session, payloads: list[dict], overwrite: bool = False) -> dict[str, int]:
+    """
+    Writes the exercise template catalog in one INSERT ... ON CONFLICT(uuid)
+    batch: new templates are inserted, changed ones are updated if overwrite
+    is set and left alone otherwise. Every written template gets an
+    exercise id with its title and its muscle groups rewritten. Returns
+    inserted/updated/unchanged counts.
+    """
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    if not payloads:
+        return counts
+
+    table = ExerciseTemplate.__table__
+    rows = list({r["uuid"]: r for r in map(exercise_template_row, payloads)}.values())
+    new, changed, _ = _diff_catalog(session, table, rows)
+    changed = changed if overwrite else []
+
+    _upsert(session, table, new + changed, ("uuid",), update=overwrite)
+    # the catalog title is the display title of the exercise
+    intern_exercises(session, [(r["uuid"], r["title"]) for r in new + changed], update=True)
+    refresh_exercise_template_muscle_groups(session, [r["uuid"] for r in new + changed])
+
+    counts["inserted"] = len(new)
+    counts["updated"] = len(changed)
+    counts["unchanged"] = len(rows) - len(new) - len(changed)
+    return counts
+
+
+def sync_routines(session: Session, payloads: list[dict], overwrite: bool = False) -> dict[str, int]:
+    """
+    Same as sync_exercise_templates for routines. A routine counts as changed
+    if any of its columns differ, Hevy bumps updated_at whenever its exercises
+    or sets are edited. The exercises and sets of every inserted or updated
+    routine are (re-)inserted in bulk.
+    """
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    if not payloads:
+        return counts
+
+    routine_table = Routine.__table__
+    exercise_table = RoutineExercise.__table__
+    set_table = RoutineSet.__table__
+
+    payloads = list({p["id"]: p for p in payloads}.values())
+    rows = [_normalize(routine_row(p)) for p in payloads]
+    new, changed, stored = _diff_catalog(session, routine_table, rows)
+    changed = changed if overwrite else []
+
+    written = new + changed
+    _upsert(session, routine_table, written, ("uuid",), update=overwrite)
+
+    if written:
+        # children of updated routines are replaced
+        changed_ids = [stored[(r["uuid"],)][0] for r in changed]
+        if changed_ids:
+            exercise_ids = select(exercise_table.c.id).where(exercise_table.c.routine_id.in_(changed_ids))
+            session.execute(delete(set_table).where(set_table.c.routine_exercise_id.in_(exercise_ids)))
+            session.execute(delete(exercise_table).where(exercise_table.c.routine_id.in_(changed_ids)))
+
+        routine_ids = {
+            uuid: row_id for (uuid,), (row_id, _) in _stored_rows(
+                session, routine_table, ("uuid",), ("uuid",),
+                where=routine_table.c.uuid.in_([r["uuid"] for r in written])
+            ).items()
+        }
+        written_payloads = [p for p in payloads if p["id"] in routine_ids]
+        _bulk_insert_tree(
+            session,
+            written_payloads,
+            tables=(routine_table, exercise_table, set_table),
+            foreign_keys=("routine_id", "routine_exercise_id"),
+            row_parsers=(routine_row, routine_exercise_row, routine_set_row),
+            parent_ids=[routine_ids[p["id"]] for p in written_payloads],
+        )
+
+    counts["inserted"] = len(new)
+    counts["updated"] = len(changed)
+    counts["unchanged"] = len(rows) - len(new) - len(changed)
+    return counts
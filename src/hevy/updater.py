@@ -1,32 +1,167 @@
+import hashlib
+import json
 import logging
-from datetime import timedelta
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta, datetime
+from functools import partial
+from typing import Callable, Iterable, Iterator
 
+from dateutil.parser import isoparse
 from sqlalchemy import select, func, delete
+from sqlalchemy.orm import Session
 
+from src.cache import bump_data_version
 from src.db.connection import SessionLocal
-from src.db.models import Workout, ExerciseTemplate, Routine
+from src.db.models import Workout, SyncState
+from src.db.summary import workout_days, refresh_exercise_daily_summary
 from src.hevy.api import HevyAPI
-from src.hevy.utils import parse_workout, sort_workouts, parse_exercise_template, parse_routine
+from src.hevy.ingest import bulk_insert_workouts, upsert_workouts, sync_exercise_templates, sync_routines
+from src.hevy.utils import sort_workout_payloads, batched
+from src.instrumentation import timed
 
 
-def insert_workouts(workouts: list[dict]) -> None:
+INSERT_BATCH_SIZE = 200
+
+# SyncState.resource keys
+WORKOUTS = "workouts"
+EXERCISE_TEMPLATES = "exercise_templates"
+ROUTINES = "routines"
+
+
+# All sync writes go through one writer at a time, so resources that are
+# fetched in parallel never contend for the SQLite write lock.
+_WRITE_LOCK = threading.Lock()
+_write_timer = threading.local()
+
+
+@contextmanager
+def write_session() -> Iterator[Session]:
+    """Session in a transaction, holding the updater's write lock."""
+    with _WRITE_LOCK:
+        start = time.perf_counter()
+        try:
+            with SessionLocal() as session, session.begin():
+                yield session
+        finally:
+            # per-thread write time, reported by refresh_data
+            _write_timer.seconds = getattr(_write_timer, "seconds", 0.0) + time.perf_counter() - start
+
+
+def get_sync_state(resource: str) -> SyncState:
+    """Returns the stored sync state of a resource, or an empty one."""
     with SessionLocal() as session:
-        workouts = [parse_workout(w) for w in workouts]
-        session.add_all(sort_workouts(workouts))
-        session.commit()
+        return session.get(SyncState, resource) or SyncState(resource=resource)
+
+
+def _save_sync_state(session: Session, resource: str, **values) -> None:
+    state = session.get(SyncState, resource) or SyncState(resource=resource)
+    for key, value in values.items():
+        setattr(state, key, value)
+    session.add(state)
+
+
+def _catalog_hash(items: list[dict]) -> str:
+    return hashlib.sha256(json.dumps(items, sort_keys=True).encode()).hexdigest()
+
+
+@timed
+def insert_workouts(workouts: Iterable[dict], batch_size: int = INSERT_BATCH_SIZE) -> int:
+    """
+    Parses and commits workouts in batches of batch_size, so memory stays
+    bounded for streamed input. Lists are sorted by start_time up front,
+    streams are expected to arrive oldest first (see backfill_workouts), and
+    every batch is sorted before insertion. Returns the number of workouts.
+    """
+    if isinstance(workouts, list):
+        workouts = sort_workout_payloads(workouts)
+
+    count = 0
+    for batch in batched(workouts, batch_size):
+        with write_session() as session:
+            count += bulk_insert_workouts(session, batch)
+            refresh_exercise_daily_summary(session, workout_days(session, [w["id"] for w in batch]))
+    return count
+
 
+@timed
+def backfill_workouts() -> int:
+    """
+    Streams the full workout history from the API into the database, oldest
+    page first, committing page by page. Workouts that are already stored
+    are skipped, or updated if their updated_at changed.
+
+    An interrupted backfill (SyncState.last_page set) walks all pages again
+    instead of skipping the ones it did: pages are counted from the newest
+    workout, so every workout added or deleted in between moves the page
+    boundaries. The walk also deletes stored workouts the API no longer
+    returns. Returns the number of new workouts.
+    """
+    resumed = get_sync_state(WORKOUTS).last_page is not None
+    if resumed:
+        logging.info("Resuming workout backfill from the oldest page.")
+
+    count = pages_done = 0
+    seen_uuids = set()
+    for page in HevyAPI.iter_workout_pages(oldest_first=True):
+        seen_uuids.update(w["id"] for w in page)
+        with write_session() as session:
+            stored_stmt = select(Workout.uuid, Workout.updated_at).where(Workout.uuid.in_([w["id"] for w in page]))
+            stored = dict(session.execute(stored_stmt).all())
+            new_workouts = [w for w in page if w["id"] not in stored]
+            changed = [
+                w for w in page
+                if w["id"] in stored and isoparse(w["updated_at"]).replace(tzinfo=None) != stored[w["id"]]
+            ]
+            # days of the old versions, before they are rewritten
+            touched_days = workout_days(session, [w["id"] for w in changed])
+            count += bulk_insert_workouts(session, new_workouts)
+            upsert_workouts(session, changed)
+            touched_days |= workout_days(session, [w["id"] for w in new_workouts + changed])
+            refresh_exercise_daily_summary(session, touched_days)
+            pages_done += 1
+            _save_sync_state(session, WORKOUTS, last_page=pages_done)
+
+    with write_session() as session:
+        if resumed:
+            stored_uuids = set(session.execute(select(Workout.uuid)).scalars())
+            deleted_uuids = stored_uuids - seen_uuids
+            if deleted_uuids:
+                touched_days = workout_days(session, deleted_uuids)
+                session.execute(delete(Workout).where(Workout.uuid.in_(deleted_uuids)))
+                refresh_exercise_daily_summary(session, touched_days)
+                logging.info(f"Deleted {len(deleted_uuids)} workouts no longer returned by the API.")
+        last_event_at = session.execute(select(func.max(Workout.updated_at))).scalar_one()
+        _save_sync_state(session, WORKOUTS, last_page=None, last_event_at=last_event_at)
+
+    logging.info(f"Backfilled {count} workouts.")
+    return count
+
+
+def get_most_recent_update() -> datetime | None:
+    """
+    Watermark of the workout sync. Falls back to the newest updated_at for
+    databases that were filled before the sync state was tracked.
+    """
+    last_event_at = get_sync_state(WORKOUTS).last_event_at
+    if last_event_at is not None:
+        return last_event_at
 
-def get_most_recent_update():
     with SessionLocal() as session:
         stmt = select(func.max(Workout.updated_at))
         return session.execute(stmt).scalar_one()
 
 
+@timed
 def process_new_workout_events():
+    state = get_sync_state(WORKOUTS)
     last_update = get_most_recent_update()
 
-    if not last_update:
-        logging.info("Could not find last update time, likely because there are no workouts yet.")
+    if state.last_page is not None or not last_update:
+        logging.info("No complete workout history yet, running backfill.")
+        backfill_workouts()
         return
 
     workout_events = HevyAPI.get_workouts_events(since=last_update + timedelta(seconds=1))
@@ -34,87 +169,142 @@ def process_new_workout_events():
         logging.info("No new updates.")
         return
 
-    grouped_events = {"updated": [], "deleted": []}
+    # updated events carry the whole workout, deleted ones only its id and deleted_at
+    updated_workouts = [e["workout"] for e in workout_events if e["type"] == "updated"]
+    deleted_events = [e for e in workout_events if e["type"] == "deleted"]
 
-    for event in workout_events:
-        event_type = event["type"]
-        workout = event["workout"]
-        if event_type in grouped_events.keys():
-            grouped_events[event_type].append(workout)
+    # Delete removed workouts, apply updates as a diff against the stored rows
+    with write_session() as session:
+        deleted_ids = {e["id"] for e in deleted_events}
+        updated_ids = {w["id"] for w in updated_workouts} - deleted_ids
+        # days whose summary changes, before the old versions are gone
+        touched_days = workout_days(session, deleted_ids | updated_ids)
+
+        if deleted_ids:
+            delete_stmt = delete(Workout).where(Workout.uuid.in_(deleted_ids))
+            session.execute(delete_stmt)
 
-    # Delete all workouts that have been updated or deleted.
-    # For updates, re-insert the updated version
-    with SessionLocal() as session, session.begin():
-        # delete all workouts that had events
-        event_ids_to_delete = {w["id"] for w in grouped_events["deleted"] + grouped_events["updated"]}
-        delete_stmt = delete(Workout).where(Workout.uuid.in_(event_ids_to_delete))
-        session.execute(delete_stmt)
+        # only keep the latest version of each updated workout
+        updated = {w["id"]: w for w in updated_workouts if w["id"] not in deleted_ids}
+        counts = upsert_workouts(session, list(updated.values()))
+        logging.info(f"Applied workout events: {len(deleted_ids)} deleted, {counts}.")
 
-        # re-insert updated events
-        workouts = [parse_workout(w) for w in grouped_events["updated"]]
-        session.add_all(sort_workouts(workouts))
+        touched_days |= workout_days(session, updated_ids)
+        refresh_exercise_daily_summary(session, touched_days)
 
+        # advance the watermark to the newest event applied
+        event_times = [isoparse(w["updated_at"]).replace(tzinfo=None) for w in updated_workouts]
+        event_times += [isoparse(e["deleted_at"]).replace(tzinfo=None) for e in deleted_events if e.get("deleted_at")]
+        _save_sync_state(session, WORKOUTS, last_event_at=max(event_times + [last_update]))
 
+
+@timed
 def process_exercise_templates(overwrite=False):
     """
     Gets all exercise templates from the API and adds new
     exercise templates to the database. By default, no existing
-    exercise are overwritten, unless overwrite=True.
-    todo use same overwrite strategy as create_or_update_periodiq_plan
+    exercise are overwritten, unless overwrite=True, in which case
+    changed templates are updated in place.
+
+    Every page of the catalog is fetched, nothing is written if its hash
+    matches the last catalog written.
     """
+    state = get_sync_state(EXERCISE_TEMPLATES)
     exercise_templates = HevyAPI.get_exercise_templates()
 
-    with SessionLocal() as session, session.begin():
-        if overwrite:
-            # Overwrite by UUID
-            exercise_template_ids = [e["id"] for e in exercise_templates]
-            delete_stmt = delete(ExerciseTemplate).where(ExerciseTemplate.uuid.in_(exercise_template_ids))
-            session.execute(delete_stmt)
-        else:
-            # Only insert new UUIDs
-            existing_stmt = select(ExerciseTemplate.uuid).distinct()
-            existing_uuids = session.execute(existing_stmt).scalars().all()
-            exercise_templates = [
-                e for e in exercise_templates
-                if e["id"] not in existing_uuids
-            ]
-        exercise_templates_to_insert = [
-            parse_exercise_template(e) for e in exercise_templates
-        ]
-        session.add_all(exercise_templates_to_insert)
+    catalog_hash = _catalog_hash(exercise_templates)
+    if not overwrite and catalog_hash == state.catalog_hash:
+        logging.info("Exercise templates unchanged.")
+        return
 
+    with write_session() as session:
+        counts = sync_exercise_templates(session, exercise_templates, overwrite=overwrite)
+        _save_sync_state(session, EXERCISE_TEMPLATES, catalog_hash=catalog_hash)
+    logging.info(f"Synced exercise templates: {counts}.")
 
+
+@timed
 def process_routines(overwrite=False):
     """
     Gets all routines from the Hevy API and adds new
     routines to the database. By default, no existing
-    routines are overwritten, unless overwrite=True.
-    todo use same overwrite strategy as create_or_update_periodiq_plan
+    routines are overwritten, unless overwrite=True, in which case
+    changed routines are updated in place.
+
+    Skipped like process_exercise_templates if the catalog is unchanged.
     """
+    state = get_sync_state(ROUTINES)
     routines = HevyAPI.get_routines()
 
-    with SessionLocal() as session, session.begin():
-        if overwrite:
-            # Overwrite by UUID
-            routine_ids = [r["id"] for r in routines]
-            delete_stmt = delete(Routine).where(Routine.uuid.in_(routine_ids))
-            session.execute(delete_stmt)
-        else:
-            # Only insert new UUIDs
-            existing_stmt = select(Routine.uuid).distinct()
-            existing_uuids = session.execute(existing_stmt).scalars().all()
-            routines = [
-                r for r in routines
-                if r["id"] not in existing_uuids
-            ]
+    catalog_hash = _catalog_hash(routines)
+    if not overwrite and catalog_hash == state.catalog_hash:
+        logging.info("Routines unchanged.")
+        return
+
+    with write_session() as session:
+        counts = sync_routines(session, routines, overwrite=overwrite)
+        _save_sync_state(session, ROUTINES, catalog_hash=catalog_hash)
+    logging.info(f"Synced routines: {counts}.")
+
+
+def _timed_step(resource: str, fn: Callable[[], None], progress: Callable[[str, str], None] | None = None) -> dict:
+    if progress is not None:
+        progress(resource, "running")
+    _write_timer.seconds = 0.0
+    start = time.perf_counter()
+    error = None
+    try:
+        fn()
+    except Exception as e:
+        logging.exception(f"Sync step {resource} failed.")
+        error = f"{type(e).__name__}: {e}"
+    if progress is not None:
+        progress(resource, "failed" if error else "done")
+    return {
+        "seconds": time.perf_counter() - start,
+        "write_seconds": _write_timer.seconds,
+        "error": error,
+    }
 
-        routines_to_insert = [
-            parse_routine(e) for e in routines
-        ]
-        session.add_all(routines_to_insert)
 
+@timed
+def refresh_data(
+    overwrite_exercise_templates=False,
+    overwrite_routines=False,
+    parallel=True,
+    progress: Callable[[str, str], None] | None = None
+) -> dict:
+    """
+    Syncs workout events, exercise templates and routines. With parallel=True
+    the three resources are fetched concurrently while their writes are
+    serialized by write_session, so a refresh takes about as long as the
+    slowest resource. Failures of one resource don't stop the others.
+
+    progress, if given, is called with (resource, state) when a resource
+    starts ("running") and ends ("done" or "failed"), from the thread that
+    syncs it.
+
+    Returns a report with seconds, write_seconds and error per resource and
+    the total seconds.
+    """
+    steps = {
+        WORKOUTS: process_new_workout_events,
+        EXERCISE_TEMPLATES: partial(process_exercise_templates, overwrite=overwrite_exercise_templates),
+        ROUTINES: partial(process_routines, overwrite=overwrite_routines),
+    }
+    run_step = partial(_timed_step, progress=progress)
+
+    start = time.perf_counter()
+    try:
+        if parallel:
+            with ThreadPoolExecutor(max_workers=len(steps), thread_name_prefix="periodiq-refresh") as pool:
+                results = list(pool.map(run_step, steps.keys(), steps.values()))
+        else:
+            results = [run_step(resource, step) for resource, step in steps.items()]
+    finally:
+        # cached query results may be stale now, even if a step failed
+        bump_data_version()
 
-def refresh_data(overwrite_exercise_templates=False, overwrite_routines=False):
-    process_new_workout_events()
-    process_exercise_templates(overwrite=overwrite_exercise_templates)
-    process_routines(overwrite=overwrite_routines)
+    report = dict(zip(steps.keys(), results))
+    report["total_seconds"] = time.perf_counter() - start
+    return report
@@ -1,10 +1,15 @@
+from itertools import islice
+from typing import Iterable, Iterator, TypeVar
+
 from dateutil.parser import isoparse
 
-from src.db.models import Workout, WorkoutExercise, WorkoutSet, ExerciseTemplate, Routine, RoutineExercise, RoutineSet
+from src.db.models import ExerciseTemplate
+
+T = TypeVar("T")
 
 
-def parse_workout(payload: dict) -> Workout:
-    workout = Workout(
+def workout_row(payload: dict) -> dict:
+    return dict(
         uuid=payload["id"],
         title=payload["title"],
         description=payload.get("description"),
@@ -14,37 +19,32 @@ def parse_workout(payload: dict) -> Workout:
         created_at=isoparse(payload["created_at"]),
     )
 
-    # ----- nested exercises -----
-    for ex in payload.get("exercises", []):
-        exercise = WorkoutExercise(
-            index=ex["index"],
-            title=ex["title"],
-            notes=ex.get("notes"),
-            exercise_template_id=ex["exercise_template_id"],
-            supersets_id=ex.get("superset_id"),
-        )
-
-        # ----- nested sets -----
-        for st in ex.get("sets", []):
-            workout_set = WorkoutSet(
-                index=st["index"],
-                type=st["type"],
-                weight_kg=st["weight_kg"],
-                reps=st["reps"],
-                distance_meters=st["distance_meters"],
-                duration_seconds=st["duration_seconds"],
-                rpe=st["rpe"],
-                custom_metric=st["custom_metric"],
-            )
-            exercise.sets.append(workout_set)
-
-        workout.exercises.append(exercise)
-
-    return workout
 
+def workout_exercise_row(ex: dict) -> dict:
+    return dict(
+        index=ex["index"],
+        title=ex["title"],
+        notes=ex.get("notes"),
+        exercise_template_id=ex["exercise_template_id"],
+        supersets_id=ex.get("superset_id"),
+    )
 
-def parse_exercise_template(payload: dict) -> ExerciseTemplate:
-    return ExerciseTemplate(
+
+def workout_set_row(st: dict) -> dict:
+    return dict(
+        index=st["index"],
+        type=st["type"],
+        weight_kg=st["weight_kg"],
+        reps=st["reps"],
+        distance_meters=st["distance_meters"],
+        duration_seconds=st["duration_seconds"],
+        rpe=st["rpe"],
+        custom_metric=st["custom_metric"],
+    )
+
+
+def exercise_template_row(payload: dict) -> dict:
+    return dict(
         uuid=payload["id"],
         title=payload["title"],
         type=payload["type"],
@@ -54,8 +54,12 @@ def parse_exercise_template(payload: dict) -> ExerciseTemplate:
     )
 
 
-def parse_routine(payload: dict) -> Routine:
-    routine = Routine(
+def parse_exercise_template(payload: dict) -> ExerciseTemplate:
+    return ExerciseTemplate(**exercise_template_row(payload))
+
+
+def routine_row(payload: dict) -> dict:
+    return dict(
         uuid=payload["id"],
         title=payload["title"],
         folder_id=payload.get("folder_id"),
@@ -63,35 +67,36 @@ def parse_routine(payload: dict) -> Routine:
         created_at=isoparse(payload["created_at"]),
     )
 
-    # ----- nested exercises -----
-    for ex in payload.get("exercises", []):
-        exercise = RoutineExercise(
-            index=ex["index"],
-            title=ex["title"],
-            rest_seconds=ex["rest_seconds"],
-            notes=ex.get("notes"),
-            exercise_template_id=ex.get("exercise_template_id"),
-            supersets_id=ex.get("superset_id"),
-        )
-
-        # ----- nested sets -----
-        for st in ex.get("sets", []):
-            routine_set = RoutineSet(
-                index=st["index"],
-                type=st["type"],
-                weight_kg=st.get("weight_kg"),
-                reps=st.get("reps"),
-                distance_meters=st.get("distance_meters"),
-                duration_seconds=st.get("duration_seconds"),
-                rpe=st.get("rpe"),
-                custom_metric=st.get("custom_metric"),
-            )
-            exercise.sets.append(routine_set)
-
-        routine.exercises.append(exercise)
-
-    return routine
-
-
-def sort_workouts(workouts: list[Workout]):
-    return sorted(workouts, key=lambda w: w.start_time)
+
+def routine_exercise_row(ex: dict) -> dict:
+    return dict(
+        index=ex["index"],
+        title=ex["title"],
+        rest_seconds=ex["rest_seconds"],
+        notes=ex.get("notes"),
+        exercise_template_id=ex.get("exercise_template_id"),
+        supersets_id=ex.get("superset_id"),
+    )
+
+
+def routine_set_row(st: dict) -> dict:
+    return dict(
+        index=st["index"],
+        type=st["type"],
+        weight_kg=st.get("weight_kg"),
+        reps=st.get("reps"),
+        distance_meters=st.get("distance_meters"),
+        duration_seconds=st.get("duration_seconds"),
+        rpe=st.get("rpe"),
+        custom_metric=st.get("custom_metric"),
+    )
+
+
+def sort_workout_payloads(payloads: list[dict]) -> list[dict]:
+    return sorted(payloads, key=lambda w: isoparse(w["start_time"]))
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[list[T]]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
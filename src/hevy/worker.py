@@ -0,0 +1,188 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable
+
+from src.config import ROOT_DIR, setting
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows, only the in-process lock applies there
+    fcntl = None
+
+LOCK_FILE = os.path.join(ROOT_DIR, ".periodiq-sync.lock")
+
+
+@contextmanager
+def _process_lock():
+    """
+    Exclusive lock on LOCK_FILE, so a worker started from main.py and one
+    running inside the app never sync at the same time. Yields False if
+    another process holds the lock.
+    """
+    if fcntl is None:
+        yield True
+        return
+    with open(LOCK_FILE, "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class SyncWorker:
+    """
+    Runs the Hevy sync (refresh_data) on a daemon thread every
+    `interval_minutes` (0 disables the schedule, runs then only happen
+    through trigger()). Runs never overlap, status() returns a snapshot of
+    the progress that can be polled from the UI: "resources" maps every
+    resource of the current or last run to "running", "done" or "failed".
+    If another process holds the sync lock, "running_elsewhere_at" is the
+    time a run found it held and the run is retried every `retry_seconds`
+    until it gets the lock.
+
+    The default sync, refresh_data, is imported on the first run, so
+    starting a worker doesn't load the Hevy client and updater.
+    """
+
+    interval_minutes = setting("PERIODIQ_SYNC_INTERVAL_MINUTES", 60.0, float)
+    retry_seconds = setting("PERIODIQ_SYNC_RETRY_SECONDS", 30.0, float)
+
+    def __init__(self, interval_minutes: float | None = None, sync: Callable[..., dict] | None = None):
+        if interval_minutes is not None:
+            self.interval_minutes = interval_minutes
+        self.sync = sync
+
+        self._run_lock = threading.Lock()
+        self._status_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        self._status = {
+            "running": False,
+            "started_at": None,
+            "resources": {},
+            "last_success_at": None,
+            "last_duration_s": None,
+            "last_error": None,
+            "last_report": None,
+            "running_elsewhere_at": None,
+        }
+
+    def status(self) -> dict:
+        with self._status_lock:
+            return dict(self._status)
+
+    def _set_status(self, **values) -> None:
+        with self._status_lock:
+            self._status.update(values)
+
+    def _progress(self, resource: str, state: str) -> None:
+        """Progress callback of the sync, see refresh_data."""
+        with self._status_lock:
+            # replaced, not mutated, so snapshots from status() stay as they were
+            self._status["resources"] = {**self._status["resources"], resource: state}
+
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> "SyncWorker":
+        if not self.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._loop, name="periodiq-sync", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float | None = None) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run_forever(self) -> None:
+        """Syncs now and then on schedule, on the calling thread (see main.py)."""
+        self.run_once()
+        if self.interval_minutes > 0:
+            self._loop()
+
+    def trigger(self) -> None:
+        """Requests a sync as soon as possible without blocking the caller."""
+        self._wakeup.set()
+
+    def _loop(self) -> None:
+        interval = self.interval_minutes * 60 if self.interval_minutes > 0 else None
+        next_run = time.monotonic() + interval if interval else None
+        if self.status()["running_elsewhere_at"] is not None:
+            # the first run of run_forever found the lock held
+            next_run = time.monotonic() + self.retry_seconds
+
+        while not self._stopped.is_set():
+            timeout = None if next_run is None else max(next_run - time.monotonic(), 0)
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+
+            self.run_once()
+            next_run = time.monotonic() + interval if interval else None
+            if self.status()["running_elsewhere_at"] is not None:
+                # try again once the other process is done
+                retry_at = time.monotonic() + self.retry_seconds
+                next_run = retry_at if next_run is None else min(next_run, retry_at)
+
+    def run_once(self) -> bool:
+        """
+        Runs all sync steps on the calling thread. Returns False without doing
+        anything if a sync is already running in this or another process, the
+        latter is shown by status()["running_elsewhere_at"].
+        """
+        if not self._run_lock.acquire(blocking=False):
+            logging.info("Sync already running, skipping.")
+            return False
+
+        try:
+            with _process_lock() as acquired:
+                if not acquired:
+                    logging.info("Sync running in another process, skipping.")
+                    self._set_status(running_elsewhere_at=datetime.now())
+                    return False
+
+                started_at = datetime.now()
+                self._set_status(
+                    running=True, started_at=started_at, resources={}, last_error=None, running_elsewhere_at=None
+                )
+                try:
+                    if self.sync is None:
+                        from src.hevy.updater import refresh_data
+                        self.sync = refresh_data
+                    report = self.sync(progress=self._progress)
+                except Exception as e:
+                    logging.exception("Sync failed.")
+                    self._set_status(last_error=f"{type(e).__name__}: {e}")
+                    return False
+                finally:
+                    self._set_status(
+                        running=False,
+                        last_duration_s=(datetime.now() - started_at).total_seconds()
+                    )
+
+                errors = [
+                    f"{resource}: {result['error']}" for resource, result in report.items()
+                    if isinstance(result, dict) and result.get("error")
+                ]
+                self._set_status(last_report=report, last_error="; ".join(errors) or None)
+                if errors:
+                    return False
+                self._set_status(last_success_at=datetime.now())
+                return True
+        finally:
+            self._run_lock.release()
@@ -0,0 +1,171 @@
+"""
+Opt-in timing of SQL statements, data functions and app renders.
+
+Enable with PERIODIQ_INSTRUMENTATION=1 in .env or at runtime with
+enable(). While disabled the engine listeners and @timed wrappers return
+right away. Collected numbers are shown in the Settings tab and can be
+written to JSON with dump_json for offline analysis.
+"""
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from functools import wraps
+from typing import Any, Callable
+
+from sqlalchemy import Engine, event
+
+from src.config import CONFIG, flag
+
+MAX_STATEMENT_LENGTH = 500
+RENDER_HISTORY = 50
+
+# None until the PERIODIQ_INSTRUMENTATION setting is first read
+_enabled: bool | None = None
+_lock = threading.Lock()
+_local = threading.local()
+
+_queries: dict[str, dict[str, float]] = {}
+_functions: dict[str, dict[str, float]] = {}
+_renders: deque[dict] = deque(maxlen=RENDER_HISTORY)
+
+
+def is_enabled() -> bool:
+    global _enabled
+    if _enabled is None:
+        _enabled = flag(CONFIG.get("PERIODIQ_INSTRUMENTATION"))
+    return _enabled
+
+
+def enable() -> None:
+    global _enabled
+    _enabled = True
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+
+def reset() -> None:
+    with _lock:
+        _queries.clear()
+        _functions.clear()
+        _renders.clear()
+
+
+def _query_count() -> int:
+    """Statements executed on this thread so far."""
+    return getattr(_local, "queries", 0)
+
+
+def _add(stats: dict[str, dict[str, float]], key: str, seconds: float, **counts: int) -> None:
+    with _lock:
+        entry = stats.get(key)
+        if entry is None:
+            entry = stats[key] = {"calls": 0, "total_s": 0.0, "max_s": 0.0, **{k: 0 for k in counts}}
+        entry["calls"] += 1
+        entry["total_s"] += seconds
+        entry["max_s"] = max(entry["max_s"], seconds)
+        for name, value in counts.items():
+            entry[name] += value
+
+
+# ----- SQL statements -----
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if is_enabled():
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    seconds = time.perf_counter() - starts.pop()
+    _local.queries = _query_count() + 1
+    # sqlite3 only reports a row count for writes
+    rows = max(cursor.rowcount, 0)
+    _add(_queries, " ".join(statement.split())[:MAX_STATEMENT_LENGTH], seconds, rows=rows)
+
+
+def instrument_engine(engine: Engine) -> None:
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ----- functions -----
+
+def _result_rows(result: Any) -> int:
+    if isinstance(result, dict):
+        return sum(_result_rows(v) for v in result.values())
+    try:
+        return len(result)
+    except TypeError:
+        return 0
+
+
+def timed(fn: Callable) -> Callable:
+    """Records calls, time, statements and result rows of fn while enabled."""
+    name = f"{fn.__module__}.{fn.__qualname__}"
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not is_enabled():
+            return fn(*args, **kwargs)
+        queries = _query_count()
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        _add(
+            _functions,
+            name,
+            time.perf_counter() - start,
+            queries=_query_count() - queries,
+            rows=_result_rows(result)
+        )
+        return result
+
+    return wrapper
+
+
+# ----- renders -----
+
+def start_render() -> dict | None:
+    """Call at the top of an app run, pass the result to finish_render."""
+    if not is_enabled():
+        return None
+    return {"started_at": datetime.now(), "start": time.perf_counter(), "queries": _query_count()}
+
+
+def finish_render(render: dict | None) -> None:
+    if render is None:
+        return
+    with _lock:
+        _renders.append({
+            "started_at": render["started_at"].isoformat(timespec="seconds"),
+            "seconds": time.perf_counter() - render["start"],
+            "queries": _query_count() - render["queries"],
+        })
+
+
+# ----- reporting -----
+
+def snapshot() -> dict:
+    with _lock:
+        return {
+            "enabled": is_enabled(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "queries": [{"statement": k, **v} for k, v in _queries.items()],
+            "functions": [{"function": k, **v} for k, v in _functions.items()],
+            "renders": list(_renders),
+        }
+
+
+def dump_json(path: str | None = None) -> str:
+    """Returns the snapshot as JSON, also writing it to path if given."""
+    data = json.dumps(snapshot(), indent=2)
+    if path is not None:
+        with open(path, "w") as f:
+            f.write(data)
+    return data
@@ -0,0 +1,27 @@
+import pytest
+from sqlalchemy import create_engine, event, Engine
+from sqlalchemy.orm import sessionmaker
+
+from src.db.connection import _apply_sqlite_pragmas
+from src.db.migrations import migrate
+
+
+@pytest.fixture
+def empty_engine(tmp_path) -> Engine:
+    """Engine on a new SQLite file, not migrated, with the app's PRAGMAs (foreign_keys=ON)."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'periodiq.db'}")
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def engine(empty_engine) -> Engine:
+    """Engine on a new SQLite file with the current schema."""
+    migrate(empty_engine)
+    return empty_engine
+
+
+@pytest.fixture
+def session_factory(engine) -> sessionmaker:
+    return sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
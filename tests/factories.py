@@ -0,0 +1,53 @@
+"""Synthetic Hevy API payloads, shared by the tests and the benchmarks."""
+from datetime import datetime, timedelta
+
+EXERCISES = [
+    ("Squat (Barbell)", "D04AC939"),
+    ("Bench Press (Barbell)", "79D0BB3A"),
+    ("Deadlift (Barbell)", "C6272009"),
+    ("Overhead Press (Barbell)", "7B8D84E8"),
+    ("Bent Over Row (Barbell)", "55E6546F"),
+    ("Pull Up", "1B2B1E7C"),
+]
+
+
+def make_workout(i: int, n_exercises: int = 5, n_sets: int = 4) -> dict:
+    """Synthetic workout payload in the shape returned by the Hevy API."""
+    start = datetime(2018, 1, 1) + timedelta(days=i // 2, hours=12 * (i % 2))
+    exercises = []
+    for e in range(n_exercises):
+        title, template_id = EXERCISES[(i + e) % len(EXERCISES)]
+        exercises.append({
+            "index": e,
+            "title": title,
+            "notes": None,
+            "exercise_template_id": template_id,
+            "superset_id": None,
+            "sets": [
+                {
+                    "index": s,
+                    "type": "normal",
+                    "weight_kg": 40 + (i % 50) + 2.5 * s,
+                    "reps": 5 + (s + i) % 6,
+                    "distance_meters": None,
+                    "duration_seconds": None,
+                    "rpe": None,
+                    "custom_metric": None,
+                }
+                for s in range(n_sets)
+            ],
+        })
+    return {
+        "id": f"workout-{i:06d}",
+        "title": f"Week {i // 4} // Day {i % 4}",
+        "description": None,
+        "start_time": start.isoformat() + "+00:00",
+        "end_time": (start + timedelta(hours=1)).isoformat() + "+00:00",
+        "updated_at": start.isoformat() + "+00:00",
+        "created_at": start.isoformat() + "+00:00",
+        "exercises": exercises,
+    }
+
+
+def make_workouts(n: int) -> list[dict]:
+    return [make_workout(i) for i in range(n)]
@@ -0,0 +1,118 @@
+"""
+The per-set loop workout_sets_pivot replaced and the ORM read path it ran
+on, kept as the reference the vectorized pivot is checked against
+(tests/test_pivot.py, benchmarks/bench_pivot.py, benchmarks/bench_read_path.py).
+"""
+from datetime import datetime
+from typing import Any
+
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from src.data_utils import KG_TO_LBS, UNCATEGORIZED, _workout_sets_stmt, get_workout_day, group_workout_sets, \
+    workout_sets_pivot
+from src.db.models import Workout, WorkoutExercise
+
+
+def orm_to_dict(obj: Any, recurse_relationships=True, visited=None):
+    if obj is None:
+        return None
+
+    if visited is None:
+        visited = set()
+
+    # Prevent infinite recursion by checking visited identity
+    obj_id = id(obj)
+    if obj_id in visited:
+        return {"_ref": str(obj)}  # or None, or skip entirely
+    visited.add(obj_id)
+
+    result = {}
+
+    # Regular columns
+    for column in obj.__table__.columns:
+        val = getattr(obj, column.name)
+        if isinstance(val, datetime):
+            result[column.name] = val.isoformat()
+        else:
+            result[column.name] = val
+
+    # Related objects
+    if recurse_relationships:
+        for rel in obj.__mapper__.relationships:
+            val = getattr(obj, rel.key)
+            if val is None:
+                result[rel.key] = None
+            elif rel.uselist:
+                result[rel.key] = [orm_to_dict(i, recurse_relationships, visited) for i in val]
+            else:
+                result[rel.key] = orm_to_dict(val, recurse_relationships, visited)
+
+    return result
+
+
+def exercises_of_workouts(workouts):
+    exercises = []
+    for w in workouts:
+        exercises.extend(w['exercises'])
+    sorted_exercises = sorted(exercises, key=lambda e: e["index"])
+    return list(dict.fromkeys([e["title"] for e in sorted_exercises]))
+
+
+def legacy_workout_df_for_routine(exercises, workouts):
+    rows = {e: [] for e in exercises}
+    columns_set = set()
+    columns = []
+
+    for workout in workouts:
+        start_time = datetime.fromisoformat(workout['start_time']).strftime("%Y-%m-%d %H:%M")
+        max_sets = max([len(e['sets']) for e in workout['exercises']])
+
+        for ex in exercises:
+            gex = next((e for e in workout['exercises'] if e['title'] == ex), None)
+            set_values = []
+            if gex:
+                for idx, s in enumerate(gex['sets']):
+                    for col_name in [(start_time, f'W {idx + 1}'), (start_time, f'R {idx + 1}')]:
+                        if col_name not in columns_set:
+                            columns_set.add(col_name)
+                            columns.append(col_name)
+                    set_values.append(int((s.get('weight_kg') or 0) * KG_TO_LBS))
+                    set_values.append(int(s.get('reps') or 0))
+
+            set_values.extend([None] * (max_sets * 2 - len(set_values)))
+            rows[ex].extend(set_values)
+
+    df = pd.DataFrame.from_dict(data=rows, orient='index').astype('Int64')
+    df.columns = pd.MultiIndex.from_tuples(tuples=columns)
+    return df
+
+
+def legacy_by_day(workouts):
+    grouped = {}
+    for workout in workouts:
+        grouped.setdefault(get_workout_day(workout), []).append(workout)
+    order = list(grouped)
+    if UNCATEGORIZED in order:
+        order.remove(UNCATEGORIZED)
+        order.append(UNCATEGORIZED)
+    return {g: legacy_workout_df_for_routine(exercises_of_workouts(grouped[g]), grouped[g]) for g in order}
+
+
+def legacy(session, uuids):
+    stmt = (
+        select(Workout)
+        .where(Workout.uuid.in_(uuids))
+        .order_by(Workout.start_time)
+        .options(selectinload(Workout.exercises).selectinload(WorkoutExercise.sets))
+    )
+    workouts = [orm_to_dict(w) for w in session.execute(stmt).scalars().all()]
+    return legacy_workout_df_for_routine(exercises_of_workouts(workouts), workouts), legacy_by_day(workouts)
+
+
+def vectorized(session, uuids):
+    result = session.execute(_workout_sets_stmt(Workout.uuid.in_(uuids)))
+    sets = pd.DataFrame(result.all(), columns=list(result.keys()))
+    by_day = {g: workout_sets_pivot(group_sets) for g, group_sets in group_workout_sets(sets).items()}
+    return workout_sets_pivot(sets), by_day
@@ -0,0 +1,41 @@
+from datetime import date
+
+import pandas as pd
+
+from src.cache import cached, bump_data_version
+
+
+def test_cached_values_are_copies():
+    calls = []
+
+    @cached
+    def frames(n: int) -> dict:
+        calls.append(n)
+        return {"table": pd.DataFrame({"a": range(n)}), "days": [pd.Series([1, 2])]}
+
+    bump_data_version()
+    first = frames(3)
+    first["table"].loc[0, "a"] = 100
+    first["days"][0][:] = 0
+    first["extra"] = None
+
+    second = frames(3)
+    assert calls == [3]
+    assert list(second) == ["table", "days"]
+    assert second["table"]["a"].tolist() == [0, 1, 2]
+    assert second["days"][0].tolist() == [1, 2]
+
+
+def test_date_argument_is_part_of_the_key():
+    calls = []
+
+    @cached
+    def until(today: date) -> pd.DataFrame:
+        calls.append(today)
+        return pd.DataFrame({"day": [today]})
+
+    bump_data_version()
+    until(date(2026, 1, 1))
+    until(date(2026, 1, 1))
+    assert until(date(2026, 1, 2))["day"].tolist() == [date(2026, 1, 2)]
+    assert calls == [date(2026, 1, 1), date(2026, 1, 2)]
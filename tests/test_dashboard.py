@@ -0,0 +1,73 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from src import data_utils, e1rm
+from src.cache import bump_data_version
+from src.db.summary import rebuild_exercise_daily_summary
+from src.hevy.ingest import bulk_insert_workouts, sync_exercise_templates
+from tests.factories import make_workout
+
+SQUAT, FRONT_SQUAT, UNSEEN = "D04AC939", "F0000001", "00000000"
+
+
+def _workout(i: int, title: str, template_id: str, weight_kg: float) -> dict:
+    workout = make_workout(i, n_exercises=1, n_sets=1)
+    exercise = workout["exercises"][0]
+    exercise.update(title=title, exercise_template_id=template_id)
+    exercise["sets"][0].update(weight_kg=weight_kg, reps=1)
+    return workout
+
+
+@pytest.fixture
+def db(monkeypatch, session_factory):
+    monkeypatch.setattr(data_utils, "SessionLocal", session_factory)
+    monkeypatch.setattr(e1rm, "SessionLocal", session_factory)
+    with session_factory() as session, session.begin():
+        bulk_insert_workouts(session, [
+            # renamed in the catalog after the first workout
+            _workout(0, "Squat", SQUAT, 100),
+            _workout(2, "Squat (Barbell)", SQUAT, 110),
+            # a custom template with the same title
+            _workout(4, "Squat (Barbell)", FRONT_SQUAT, 80),
+        ])
+        sync_exercise_templates(session, [
+            {"id": SQUAT, "title": "Squat (Barbell)", "type": "weight_reps", "primary_muscle_group": "quadriceps",
+             "secondary_muscle_groups": [], "is_custom": False},
+        ])
+        rebuild_exercise_daily_summary(session)
+    bump_data_version()
+
+
+def test_exercises_are_resolved_by_template_id(db):
+    exercises = data_utils.get_exercises([SQUAT, FRONT_SQUAT, UNSEEN])
+    assert exercises["label"].tolist() == [
+        f"Squat (Barbell) ({SQUAT})", f"Squat (Barbell) ({FRONT_SQUAT})", UNSEEN
+    ]
+    assert exercises["exercise_id"].isna().tolist() == [False, False, True]
+
+
+def test_analytics_follow_renamed_and_shared_titles(db):
+    labels = [f"Squat (Barbell) ({SQUAT})", f"Squat (Barbell) ({FRONT_SQUAT})", UNSEEN]
+    in_lbs = [round(w * data_utils.KG_TO_LBS) for w in (110, 80)]
+
+    table = data_utils.get_rep_max_table([SQUAT, FRONT_SQUAT, UNSEEN])
+    assert table.index.tolist() == labels
+    assert table[1].tolist()[:2] == in_lbs
+    assert table.loc[UNSEEN].isna().all()
+
+    history = data_utils.get_e1rm_history([SQUAT, FRONT_SQUAT])
+    assert history.groupby("exercise")["workout"].count().to_dict() == {labels[0]: 2, labels[1]: 1}
+
+    metrics = data_utils.get_dashboard_metrics([SQUAT, FRONT_SQUAT, UNSEEN], date(2018, 1, 3))
+    assert metrics.index.tolist() == labels
+    assert metrics["heaviest_weight"].tolist()[:2] == [int(w * data_utils.KG_TO_LBS) for w in (110, 80)]
+    assert pd.isna(metrics.at[UNSEEN, "heaviest_weight"])
+
+
+def test_template_ids_without_fixed_id_are_looked_up_by_title(db):
+    bench = "79D0BB3A"
+    exercises = [(None, "Squat (Barbell)"), (bench, "Bench Press (Barbell)"), (None, "Deadlift (Trap bar)")]
+    # the first template seen with the title, the title nobody has yet is left out
+    assert data_utils.resolve_template_ids(exercises) == [SQUAT, bench]
@@ -0,0 +1,32 @@
+import numpy as np
+
+from src import e1rm
+
+NAN = np.nan
+
+
+def _sets(rows) -> e1rm.SetArrays:
+    """rows of (exercise_id, workout, julian day, weight_kg, reps), sorted like _sets_stmt."""
+    return e1rm._set_arrays(rows, {1: "Squat", 2: "Bench"})
+
+
+def test_rep_max_tables():
+    sets = _sets([
+        (1, 1, 2460000.5, 100.0, 5),
+        (1, 1, 2460000.5, 110.0, 3),
+        (1, 2, 2460002.5, 90.0, 8),
+        (2, 1, 2460000.5, 60.0, 1),
+    ])
+    table = e1rm.rep_max_table(sets, max_reps=8)
+    np.testing.assert_array_equal(table.to_numpy(), [
+        [NAN, NAN, 110.0, NAN, 100.0, NAN, NAN, 90.0],
+        [60.0, NAN, NAN, NAN, NAN, NAN, NAN, NAN],
+    ])
+
+    # 100 kg x 5 implies 100 kg x 4, nothing is implied for more reps than done
+    implied = e1rm.estimated_rep_max_table(table)
+    np.testing.assert_array_equal(implied.to_numpy(), [
+        [110.0, 110.0, 110.0, 100.0, 100.0, 90.0, 90.0, 90.0],
+        [60.0, NAN, NAN, NAN, NAN, NAN, NAN, NAN],
+    ])
+    assert implied.index.equals(table.index) and implied.columns.equals(table.columns)
@@ -0,0 +1,160 @@
+"""HevyAPI retries and paging against a local stand-in for the Hevy API."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+import requests
+
+from src.hevy import api
+from src.hevy.api import HevyAPI
+
+
+class StandIn(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.lock = threading.Lock()
+        self.script: list[tuple[int, dict[str, str]]] = []  # (status, headers) answered before any 200
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.page_count = 1
+        self.delay = 0.0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class Handler(BaseHTTPRequestHandler):
+    server: StandIn
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            status, headers = server.script.pop(0) if server.script else (200, {})
+        try:
+            if server.delay:
+                time.sleep(server.delay)
+            page = int(parse_qs(urlparse(self.path).query).get("page", ["1"])[0])
+            body = json.dumps({"page": page, "page_count": server.page_count, "workouts": [{"page": page}]}).encode()
+            self.send_response(status)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = StandIn()
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+
+    monkeypatch.setattr(HevyAPI, "BASE_URL", server.url)
+    monkeypatch.setattr(HevyAPI, "API_KEY", "test")
+    monkeypatch.setattr(HevyAPI, "MAX_RETRIES", 3)
+    monkeypatch.setattr(HevyAPI, "MAX_CONCURRENCY", 3)
+    monkeypatch.setattr(HevyAPI, "RETRY_AFTER_MAX", 60.0)
+    monkeypatch.setattr(HevyAPI, "BACKOFF_BASE", 0.001)
+    HevyAPI.set_session(None)
+    HevyAPI.reset_stats()
+    yield server
+
+    HevyAPI.set_session(None)
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def sleeps(monkeypatch) -> list[float]:
+    """Backoff delays, recorded instead of slept."""
+    delays = []
+    monkeypatch.setattr(api.time, "sleep", delays.append)
+    return delays
+
+
+def test_retries_transient_errors(server, sleeps):
+    server.script = [(503, {}), (429, {}), (500, {})]
+    response = HevyAPI._get("workouts")
+    assert response.status_code == 200
+    assert server.requests == 4
+    assert len(sleeps) == 3
+    assert HevyAPI.stats()["retries"] == 3
+    assert HevyAPI.stats()["failures"] == 0
+
+
+def test_gives_up_after_max_retries(server, sleeps):
+    server.script = [(503, {})] * 10
+    with pytest.raises(requests.HTTPError):
+        HevyAPI._get("workouts")
+    assert server.requests == HevyAPI.MAX_RETRIES + 1
+    assert HevyAPI.stats()["failures"] == 1
+
+
+def test_honours_full_retry_after(server, sleeps):
+    # longer than BACKOFF_MAX, shorter than RETRY_AFTER_MAX
+    server.script = [(429, {"Retry-After": "45"})]
+    assert HevyAPI._get("workouts").status_code == 200
+    assert sleeps == [45.0]
+
+
+def test_gives_up_on_retry_after_above_limit(server, sleeps):
+    server.script = [(429, {"Retry-After": "3600"})]
+    with pytest.raises(requests.HTTPError):
+        HevyAPI._get("workouts")
+    assert server.requests == 1
+    assert sleeps == []
+
+
+def test_retried_responses_are_closed(server, sleeps, monkeypatch):
+    closed = []
+    close = requests.Response.close
+    monkeypatch.setattr(requests.Response, "close", lambda self: closed.append(self.status_code) or close(self))
+    server.script = [(503, {}), (429, {})]
+    assert HevyAPI._get("workouts").status_code == 200
+    assert closed == [503, 429]
+
+
+def test_workouts_count_returns_error_responses(server, monkeypatch):
+    monkeypatch.setattr(HevyAPI, "MAX_RETRIES", 0)
+    server.script = [(401, {})]
+    assert HevyAPI.get_workouts_count().status_code == 401
+
+
+def test_reset_stats_keeps_types(server):
+    HevyAPI._get("workouts")
+    HevyAPI.reset_stats()
+    stats = HevyAPI.stats()
+    assert stats == {"requests": 0, "retries": 0, "failures": 0, "total_latency_s": 0.0, "max_latency_s": 0.0}
+    assert isinstance(stats["requests"], int)
+    assert isinstance(stats["max_latency_s"], float)
+
+
+def test_pages_in_flight_are_bounded(server):
+    server.page_count = 12
+    server.delay = 0.02
+    pages = [items[0]["page"] for items in HevyAPI._iter_pages("workouts", "workouts")]
+    assert pages == list(range(1, 13))
+    assert 1 < server.max_in_flight <= HevyAPI.MAX_CONCURRENCY
+
+
+def test_pages_oldest_first(server):
+    server.page_count = 5
+    pages = [items[0]["page"] for items in HevyAPI.iter_workout_pages(oldest_first=True)]
+    assert pages == [5, 4, 3, 2, 1]
@@ -0,0 +1,107 @@
+from sqlalchemy import inspect
+
+from src.db.migrations import MIGRATIONS, SCHEMA_VERSION, migrate, get_schema_version
+
+
+def _at_version_1(engine) -> None:
+    """Baseline schema: the tables without the unique upsert keys."""
+    with engine.connect() as conn:
+        MIGRATIONS[0](conn)
+        for table in ("workout_exercise", "workout_set"):
+            for index in inspect(conn).get_indexes(table):
+                conn.exec_driver_sql(f"DROP INDEX {index['name']}")
+        conn.exec_driver_sql("PRAGMA user_version = 1")
+        conn.commit()
+
+
+def test_upsert_keys_drop_orphans_and_duplicates(empty_engine):
+    _at_version_1(empty_engine)
+    with empty_engine.connect() as conn:
+        # databases written before foreign keys were enforced can hold orphans
+        conn.exec_driver_sql("PRAGMA foreign_keys = OFF")
+        conn.exec_driver_sql(
+            "INSERT INTO workout (id, uuid, title, start_time, end_time, updated_at, created_at) VALUES "
+            "(1, 'w1', 'W', '2024-01-01 10:00:00', '2024-01-01 11:00:00', "
+            "'2024-01-01 11:00:00', '2024-01-01 11:00:00')"
+        )
+        conn.exec_driver_sql(
+            'INSERT INTO workout_exercise (id, workout_id, "index", title, exercise_template_id) VALUES '
+            # 2 repeats index 0 of workout 1, 3 belongs to a deleted workout
+            "(1, 1, 0, 'Squat', 'T1'), (2, 1, 0, 'Squat', 'T1'), (3, 9, 0, 'Squat', 'T1')"
+        )
+        conn.exec_driver_sql(
+            'INSERT INTO workout_set (id, workout_exercise_id, "index", type, weight_kg, reps) VALUES '
+            "(1, 1, 0, 'normal', 100, 5), (2, 2, 0, 'normal', 100, 5), (3, 2, 0, 'normal', 105, 5), "
+            "(4, 2, 1, 'normal', 110, 3), (5, 3, 0, 'normal', 100, 5), (6, 8, 0, 'normal', 100, 5)"
+        )
+        conn.commit()
+        conn.exec_driver_sql("PRAGMA foreign_keys = ON")
+
+    assert migrate(empty_engine) == SCHEMA_VERSION
+    assert get_schema_version(empty_engine) == SCHEMA_VERSION
+    with empty_engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT id FROM workout_exercise").scalars().all() == [2]
+        assert conn.exec_driver_sql("SELECT id FROM workout_set ORDER BY id").scalars().all() == [3, 4]
+        unique = {i["name"] for t in ("workout_exercise", "workout_set")
+                  for i in inspect(conn).get_indexes(t) if i["unique"]}
+        assert unique == {"ix_workout_exercise_workout_id_index", "ix_workout_set_workout_exercise_id_index"}
+
+
+def _migrate_to(engine, version: int) -> None:
+    for target in range(get_schema_version(engine) + 1, version + 1):
+        with engine.connect() as conn:
+            MIGRATIONS[target - 1](conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {target}")
+            conn.commit()
+
+
+def test_summaries_are_rekeyed_on_exercise_ids(empty_engine):
+    _at_version_1(empty_engine)
+    with empty_engine.connect() as conn:
+        # workout_exercise as it was before exercise ids
+        conn.exec_driver_sql("ALTER TABLE workout_exercise DROP COLUMN exercise_id")
+        conn.exec_driver_sql(
+            "INSERT INTO workout (id, uuid, title, start_time, end_time, updated_at, created_at) VALUES "
+            "(1, 'w1', 'W', '2024-01-01 10:00:00', '2024-01-01 11:00:00', "
+            "'2024-01-01 11:00:00', '2024-01-01 11:00:00')"
+        )
+        conn.exec_driver_sql(
+            'INSERT INTO workout_exercise (id, workout_id, "index", title, exercise_template_id) VALUES '
+            "(1, 1, 0, 'Squat', 'T1'), (2, 1, 1, 'Bench', 'T2')"
+        )
+        conn.exec_driver_sql(
+            'INSERT INTO workout_set (id, workout_exercise_id, "index", type, weight_kg, reps) VALUES '
+            "(1, 1, 0, 'normal', 100, 5), (2, 1, 1, 'normal', 110, 3), (3, 2, 0, 'normal', 80, 5)"
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO exercise_template (uuid, title, type, primary_muscle_group, secondary_muscle_groups, "
+            "is_custom) VALUES ('T1', 'Squat (Barbell)', 'weight_reps', 'quadriceps', '[\"glutes\"]', 0)"
+        )
+        conn.commit()
+
+    # versions 5 and 6 are keyed on titles and template uuids, as they shipped
+    _migrate_to(empty_engine, 6)
+    with empty_engine.connect() as conn:
+        summary = conn.exec_driver_sql(
+            "SELECT title, day, set_count, max_weight_kg FROM exercise_daily_summary ORDER BY title"
+        ).all()
+        assert summary == [("Bench", "2024-01-01", 1, 80.0), ("Squat", "2024-01-01", 2, 110.0)]
+        muscles = conn.exec_driver_sql(
+            "SELECT exercise_template_id, muscle_group, is_primary FROM exercise_template_muscle_group "
+            "ORDER BY muscle_group"
+        ).all()
+        assert muscles == [("T1", "glutes", 0), ("T1", "quadriceps", 1)]
+
+    migrate(empty_engine)
+    with empty_engine.connect() as conn:
+        exercises = dict(conn.exec_driver_sql("SELECT template_id, id FROM exercise").all())
+        summary = conn.exec_driver_sql(
+            "SELECT exercise_id, day, set_count, max_weight_kg FROM exercise_daily_summary ORDER BY exercise_id"
+        ).all()
+        assert sorted(summary) == sorted([
+            (exercises["T1"], "2024-01-01", 2, 110.0), (exercises["T2"], "2024-01-01", 1, 80.0)
+        ])
+        muscles = conn.exec_driver_sql(
+            "SELECT exercise_id, muscle_group FROM exercise_template_muscle_group ORDER BY muscle_group"
+        ).all()
+        assert muscles == [(exercises["T1"], "glutes"), (exercises["T1"], "quadriceps")]
@@ -0,0 +1,71 @@
+"""workout_sets_pivot against the per-set loop it replaced (tests/pivot_reference.py)."""
+import pandas as pd
+import pytest
+from sqlalchemy import select, false
+
+from src.data_utils import _workout_sets_stmt, workout_sets_pivot
+from src.db.models import Workout
+from src.hevy.ingest import bulk_insert_workouts
+from tests.factories import make_workout
+from tests.pivot_reference import legacy, vectorized
+
+
+def _payloads() -> list[dict]:
+    payloads = [make_workout(i) for i in range(8)]
+    # the same exercise twice in one workout, only the first one is shown
+    repeated = dict(payloads[1]["exercises"][0], index=5)
+    repeated["sets"] = [dict(s, weight_kg=200) for s in repeated["sets"]]
+    payloads[1]["exercises"].append(repeated)
+    # an exercise without sets next to ones with sets
+    payloads[2]["exercises"][3]["sets"] = []
+    # a workout without any sets, on the same day as workout 7
+    for exercise in payloads[3]["exercises"]:
+        exercise["sets"] = []
+    # uneven set counts and a missing weight
+    payloads[4]["exercises"][0]["sets"].pop()
+    payloads[5]["exercises"][1]["sets"][0]["weight_kg"] = None
+    return payloads
+
+
+def test_pivot_matches_legacy_loop(session_factory):
+    with session_factory() as session, session.begin():
+        bulk_insert_workouts(session, _payloads())
+
+    with session_factory() as session:
+        uuids = session.execute(select(Workout.uuid)).scalars().all()
+        legacy_df, legacy_days = legacy(session, uuids)
+        new_df, new_days = vectorized(session, uuids)
+
+    pd.testing.assert_frame_equal(new_df, legacy_df)
+    assert list(new_days) == list(legacy_days)
+    for day in legacy_days:
+        pd.testing.assert_frame_equal(new_days[day], legacy_days[day])
+    # the repeated exercise's 200 kg sets are not in the table
+    assert new_df.max().max() < 200 * 2.2
+
+
+def test_pivot_of_exercises_without_sets(session_factory):
+    payload = _payloads()[3]
+    with session_factory() as session, session.begin():
+        bulk_insert_workouts(session, [payload])
+
+    with session_factory() as session:
+        uuids = session.execute(select(Workout.uuid)).scalars().all()
+        # the loop failed on a table without columns
+        with pytest.raises(TypeError):
+            legacy(session, uuids)
+        new_df, new_days = vectorized(session, uuids)
+
+    assert list(new_df.index) == [e["title"] for e in payload["exercises"]]
+    assert new_df.shape == (5, 0)
+    assert list(new_days) == ["Day 3"]
+
+
+def test_pivot_of_no_sets(session_factory):
+    with session_factory() as session:
+        result = session.execute(_workout_sets_stmt(false()))
+        sets = pd.DataFrame(result.all(), columns=list(result.keys()))
+
+    pivot = workout_sets_pivot(sets)
+    assert pivot.empty
+    assert len(pivot.index) == 0
@@ -0,0 +1,72 @@
+"""
+The Dashboard statements must not fall back to full table scans, according
+to EXPLAIN QUERY PLAN on a migrated database with some workouts.
+"""
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import sessionmaker
+
+from src import e1rm
+from src.data_utils import _weekly_set_counts_stmt, _weekly_muscle_group_stmt, \
+    _exercise_metrics_stmt, dashboard_windows
+from src.db.connection import _apply_sqlite_pragmas
+from src.db.migrations import migrate
+from src.db.models import Exercise
+from src.db.summary import rebuild_exercise_daily_summary
+from src.hevy.ingest import bulk_insert_workouts
+from tests.factories import make_workouts
+
+
+@pytest.fixture(scope="module")
+def session(tmp_path_factory):
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('plans') / 'periodiq.db'}")
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+    migrate(engine)
+    with sessionmaker(bind=engine)() as session:
+        bulk_insert_workouts(session, make_workouts(200))
+        rebuild_exercise_daily_summary(session)
+        session.commit()
+        session.connection().exec_driver_sql("ANALYZE")
+        yield session
+    engine.dispose()
+
+
+def dashboard_statements(session) -> dict:
+    exercise_ids = session.execute(select(Exercise.id).order_by(Exercise.id).limit(3)).scalars().all()
+    today = date.today()
+    prev_three = today - timedelta(90)
+    return {
+        "weekly_set_counts": _weekly_set_counts_stmt(prev_three, today),
+        "weekly_muscle_groups": _weekly_muscle_group_stmt(prev_three, today, 1.0, 0.5),
+        "exercise_metrics": _exercise_metrics_stmt(exercise_ids, dashboard_windows(today)),
+        "e1rm_sets": e1rm._sets_stmt(exercise_ids, None, None),
+    }
+
+
+def query_plan(session, stmt) -> list[str]:
+    compiled = stmt.compile(dialect=session.bind.dialect, compile_kwargs={"render_postcompile": True})
+    # the plan does not depend on the bound values
+    params = (None,) * len(compiled.positiontup or ())
+    rows = session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params)
+    return [row[-1] for row in rows]
+
+
+def table_scans(plan: list[str]) -> list[str]:
+    # "SCAN t" is a full table scan, "SCAN t USING [COVERING] INDEX ..." is not,
+    # neither is the scan of a subquery materialized from index searches
+    materialized = {step.split()[1] for step in plan if step.startswith("MATERIALIZE ")}
+    return [
+        step for step in plan
+        if step.startswith("SCAN ") and " USING " not in step and step.split()[1] not in materialized
+    ]
+
+
+@pytest.mark.parametrize(
+    "name",
+    ["weekly_set_counts", "weekly_muscle_groups", "exercise_metrics", "e1rm_sets"]
+)
+def test_no_table_scans(session, name):
+    plan = query_plan(session, dashboard_statements(session)[name])
+    assert table_scans(plan) == [], "\n".join(plan)
@@ -0,0 +1,194 @@
+import pytest
+from sqlalchemy import select, func
+
+from src.db.models import Workout, WorkoutExercise, WorkoutSet, ExerciseDailySummary, ExerciseTemplate
+from src.db.summary import rebuild_exercise_daily_summary
+from src.hevy import updater
+from src.hevy.api import HevyAPI
+from tests.factories import make_workout
+
+
+class Interrupted(Exception):
+    ...
+
+
+class FakeWorkouts:
+    """
+    The workouts endpoint: newest first, pages cut when they are requested.
+    workouts/events serves `events` as they are, on a single page.
+    """
+
+    def __init__(self, workouts: list[dict]):
+        self.workouts = workouts
+        self.events: list[dict] = []
+        self.fail_on_page: int | None = None
+
+    def get(self, path: str, params: dict | None = None, **kwargs):
+        if path == "workouts/events":
+            return FakeResponse({"page": 1, "page_count": 1, "events": self.events})
+        assert path == "workouts"
+        page, size = params["page"], params["pageSize"]
+        if page == self.fail_on_page:
+            raise Interrupted(page)
+        newest_first = sorted(self.workouts, key=lambda w: w["start_time"], reverse=True)
+        return FakeResponse({
+            "page": page,
+            "page_count": -(-len(newest_first) // size),
+            "workouts": newest_first[(page - 1) * size:page * size],
+        })
+
+
+class FakeCatalog:
+    """
+    The exercise templates endpoint. Page 1 carries an ETag of its own items
+    and is answered with 304 Not Modified if the request sends it back.
+    """
+
+    def __init__(self, templates: list[dict]):
+        self.templates = templates
+
+    def get(self, path: str, params: dict | None = None, headers: dict | None = None, **kwargs):
+        assert path == "exercise_templates"
+        page, size = params["page"], params["pageSize"]
+        items = self.templates[(page - 1) * size:page * size]
+        etag = f'"{hash(str(items))}"'
+        if page == 1 and (headers or {}).get("If-None-Match") == etag:
+            return FakeResponse({}, status_code=304)
+        return FakeResponse({
+            "page": page,
+            "page_count": -(-len(self.templates) // size),
+            "exercise_templates": items,
+        }, headers={"ETag": etag} if page == 1 else {})
+
+
+class FakeResponse:
+    def __init__(self, body: dict, status_code: int = 200, headers: dict | None = None):
+        self.body = body
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def json(self) -> dict:
+        return self.body
+
+
+@pytest.fixture
+def api(monkeypatch, session_factory) -> FakeWorkouts:
+    fake = FakeWorkouts([])
+    monkeypatch.setattr(HevyAPI, "_get", fake.get)
+    monkeypatch.setattr(HevyAPI, "MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(updater, "SessionLocal", session_factory)
+    return fake
+
+
+def _stored(session_factory) -> list[str]:
+    with session_factory() as session:
+        return sorted(session.execute(select(Workout.uuid)).scalars())
+
+
+def _children(session_factory) -> tuple[int, int]:
+    """Numbers of stored workout_exercise and workout_set rows."""
+    with session_factory() as session:
+        return (
+            session.execute(select(func.count(WorkoutExercise.id))).scalar(),
+            session.execute(select(func.count(WorkoutSet.id))).scalar(),
+        )
+
+
+def test_resumed_backfill_sees_workouts_added_in_between(api, session_factory):
+    # 25 workouts are 3 pages of 10, 10 and 5 (the oldest)
+    api.workouts = [make_workout(i) for i in range(25)]
+    api.fail_on_page = 2
+    with pytest.raises(Interrupted):
+        updater.backfill_workouts()
+    assert _stored(session_factory) == [f"workout-{i:06d}" for i in range(5)]
+    assert updater.get_sync_state(updater.WORKOUTS).last_page == 1
+
+    # a new workout moves the oldest page to workouts 0-5
+    api.workouts.append(make_workout(25))
+    api.fail_on_page = None
+    assert updater.backfill_workouts() == 21
+    assert _stored(session_factory) == [f"workout-{i:06d}" for i in range(26)]
+    assert updater.get_sync_state(updater.WORKOUTS).last_page is None
+
+
+def test_resumed_backfill_applies_changes_made_in_between(api, session_factory):
+    api.workouts = [make_workout(i) for i in range(25)]
+    api.fail_on_page = 1
+    with pytest.raises(Interrupted):
+        updater.backfill_workouts()
+    # nothing stored yet, the fetch of page 1 failed
+    assert updater.get_sync_state(updater.WORKOUTS).last_page is None
+
+    api.fail_on_page = 2
+    with pytest.raises(Interrupted):
+        updater.backfill_workouts()
+
+    # workout 0 gets heavier, workout 1 is deleted
+    api.workouts[0]["exercises"][0]["sets"][0]["weight_kg"] += 100
+    api.workouts[0]["updated_at"] = "2030-01-01T00:00:00+00:00"
+    del api.workouts[1]
+    api.fail_on_page = None
+    updater.backfill_workouts()
+
+    assert _stored(session_factory) == [f"workout-{i:06d}" for i in range(25) if i != 1]
+    # the exercises and sets of workout 1 went with it (5 exercises of 4 sets each)
+    assert _children(session_factory) == (24 * 5, 24 * 5 * 4)
+    # the incremental summary matches a rebuild
+    summary = ExerciseDailySummary.__table__
+    with session_factory() as session:
+        incremental = session.execute(select(summary).order_by(summary.c.exercise_id, summary.c.day)).all()
+        rebuild_exercise_daily_summary(session)
+        rebuilt = session.execute(select(summary).order_by(summary.c.exercise_id, summary.c.day)).all()
+    assert incremental == rebuilt
+    assert max(row.max_weight_kg for row in rebuilt) == 140
+
+
+
+def test_workout_events_delete_and_update(api, session_factory):
+    api.workouts = [make_workout(i) for i in range(3)]
+    updater.backfill_workouts()
+
+    updated = make_workout(0)
+    updated["exercises"][0]["sets"][0]["weight_kg"] += 100
+    updated["updated_at"] = "2030-01-01T00:00:00+00:00"
+    api.events = [
+        {"type": "updated", "workout": updated},
+        # deleted events have no workout, only its id
+        {"type": "deleted", "id": "workout-000001", "deleted_at": "2030-01-02T00:00:00+00:00"},
+    ]
+    updater.process_new_workout_events()
+
+    assert _stored(session_factory) == ["workout-000000", "workout-000002"]
+    assert _children(session_factory) == (2 * 5, 2 * 5 * 4)
+    with session_factory() as session:
+        max_weight = session.execute(select(func.max(WorkoutSet.weight_kg))).scalar()
+    assert max_weight == updated["exercises"][0]["sets"][0]["weight_kg"]
+    assert updater.get_sync_state(updater.WORKOUTS).last_event_at.isoformat() == "2030-01-02T00:00:00"
+
+def _template(i: int) -> dict:
+    return {
+        "id": f"template-{i:04d}",
+        "title": f"Exercise {i}",
+        "type": "weight_reps",
+        "primary_muscle_group": "chest",
+        "secondary_muscle_groups": [],
+        "is_custom": False,
+    }
+
+
+def test_catalog_changes_past_page_1_are_synced(monkeypatch, session_factory):
+    # 150 templates are 2 pages of 100 and 50
+    catalog = FakeCatalog([_template(i) for i in range(150)])
+    monkeypatch.setattr(HevyAPI, "_get", catalog.get)
+    monkeypatch.setattr(HevyAPI, "MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(updater, "SessionLocal", session_factory)
+    updater.process_exercise_templates()
+
+    # a new template on page 2, page 1 would still answer 304
+    catalog.templates.append(_template(150))
+    updater.process_exercise_templates()
+
+    with session_factory() as session:
+        stored = session.execute(select(ExerciseTemplate.uuid)).scalars().all()
+    assert len(stored) == 151
+    assert "template-0150" in stored
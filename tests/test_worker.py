@@ -0,0 +1,79 @@
+import threading
+
+from src.hevy import updater, worker
+from src.hevy.worker import SyncWorker
+
+
+def test_refresh_data_reports_progress(monkeypatch):
+    def fail():
+        raise RuntimeError("offline")
+
+    monkeypatch.setattr(updater, "process_new_workout_events", lambda: None)
+    monkeypatch.setattr(updater, "process_exercise_templates", lambda overwrite: fail())
+    monkeypatch.setattr(updater, "process_routines", lambda overwrite: None)
+
+    lock = threading.Lock()
+    calls = []
+
+    def progress(resource, state):
+        with lock:
+            calls.append((resource, state))
+
+    report = updater.refresh_data(progress=progress)
+    assert report[updater.EXERCISE_TEMPLATES]["error"] == "RuntimeError: offline"
+    for resource, final in [(updater.WORKOUTS, "done"), (updater.EXERCISE_TEMPLATES, "failed"),
+                            (updater.ROUTINES, "done")]:
+        assert [state for r, state in calls if r == resource] == ["running", final]
+
+
+def test_worker_status_shows_resources(monkeypatch, tmp_path):
+    monkeypatch.setattr(worker, "LOCK_FILE", str(tmp_path / "sync.lock"))
+    snapshots = []
+
+    def sync(progress):
+        progress("workouts", "running")
+        progress("routines", "running")
+        progress("routines", "done")
+        snapshots.append(sync_worker.status())
+        progress("workouts", "done")
+        return {"workouts": {"error": None}, "routines": {"error": None}}
+
+    sync_worker = SyncWorker(interval_minutes=0, sync=sync)
+    assert sync_worker.run_once()
+
+    during = snapshots[0]
+    assert during["running"]
+    assert during["resources"] == {"workouts": "running", "routines": "done"}
+    after = sync_worker.status()
+    assert not after["running"]
+    assert after["resources"] == {"workouts": "done", "routines": "done"}
+
+
+def test_worker_retries_while_another_process_syncs(monkeypatch, tmp_path):
+    monkeypatch.setattr(worker, "LOCK_FILE", str(tmp_path / "sync.lock"))
+    synced = threading.Event()
+
+    def sync(progress):
+        synced.set()
+        return {}
+
+    sync_worker = SyncWorker(interval_minutes=0, sync=sync)
+    sync_worker.retry_seconds = 0.05
+    with worker._process_lock() as acquired:
+        # the lock file is held like by the sync of main.py
+        assert acquired
+        assert not sync_worker.run_once()
+        assert sync_worker.status()["running_elsewhere_at"] is not None
+
+        sync_worker.start()
+        sync_worker.trigger()
+        assert not synced.wait(0.2)
+
+    # the retry gets the lock once it is released
+    try:
+        assert synced.wait(5)
+    finally:
+        sync_worker.stop(timeout=5)
+    status = sync_worker.status()
+    assert status["running_elsewhere_at"] is None
+    assert status["last_success_at"] is not None